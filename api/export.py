@@ -0,0 +1,43 @@
+from asgiref.sync import sync_to_async
+from django.utils.dateparse import parse_datetime
+from django.utils.timezone import is_naive, make_aware
+
+from api.serializers import ProductExportSerializer, ValuesSerializer
+from goods.models import Products
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+def parse_since(value):
+    """Время из параметра since (ISO 8601); без часового пояса - в поясе проекта. None, если формат неверный"""
+    try:
+        since = parse_datetime(value)
+    except ValueError:
+        return None
+    if since is not None and is_naive(since):
+        since = make_aware(since)
+    return since
+
+
+def export_products(since=None, request=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Товары каталога для выгрузки по одному словарю, в порядке изменения.
+
+    Строки читаются курсором на стороне сервера пачками по chunk_size, поэтому память не зависит от
+    размера каталога. since - только товары, измененные начиная с этого момента (удаленные не попадают)"""
+    serializer = ValuesSerializer(ProductExportSerializer(context={"request": request}))
+    queryset = Products.objects.order_by("updated_timestamp", "id")
+    if since is not None:
+        queryset = queryset.filter(updated_timestamp__gte=since)
+
+    for row in serializer.get_queryset(queryset).iterator(chunk_size=chunk_size):
+        yield serializer.to_representation(row)
+
+
+async def aiter_chunks(chunks):
+    """Синхронный генератор пачек как асинхронный итератор: каждая пачка берется в потоке через sync_to_async.
+    Под ASGI Django собирает синхронный потоковый ответ в список целиком до первого байта, а так ответ
+    уходит по пачке. Все пачки берутся в одном потоке: в нем открыт серверный курсор"""
+    iterator = iter(chunks)
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    while (chunk := await next_chunk(iterator, None)) is not None:
+        yield chunk
@@ -0,0 +1,33 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.export import EXPORT_CHUNK_SIZE, export_products, parse_since
+from api.renderers import CSVRenderer, NDJSONRenderer
+
+RENDERERS = {"ndjson": NDJSONRenderer, "csv": CSVRenderer}
+
+
+class Command(BaseCommand):
+    help = "Выгружает каталог товаров в NDJSON или CSV (в файл или stdout) с постоянным расходом памяти"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=RENDERERS, default="ndjson")
+        parser.add_argument("--since", help="только товары, измененные с этого момента (ISO 8601)")
+        parser.add_argument("--output", help="файл для выгрузки; по умолчанию stdout")
+        parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        since = None
+        if options["since"]:
+            since = parse_since(options["since"])
+            if since is None:
+                raise CommandError("--since: дата и время в формате ISO 8601")
+
+        products = export_products(since, chunk_size=options["chunk_size"])
+        chunks = RENDERERS[options["format"]]().stream(products)
+        if options["output"]:
+            with open(options["output"], "wb") as output:
+                output.writelines(chunks)
+        else:
+            sys.stdout.buffer.writelines(chunks)
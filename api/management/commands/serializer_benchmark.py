@@ -0,0 +1,84 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.serializers import CartSerializer, ProductSerializer, ValuesSerializer
+from carts.models import Cart
+from goods.models import Categories, Products
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = "Сравнивает скорость ProductSerializer/CartSerializer и ValuesSerializer на странице из N строк"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1000)
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        request = Request(APIRequestFactory().get("/api/v1/products/", secure=True, HTTP_HOST="localhost"))
+
+        # Данные создаются внутри транзакции и откатываются после замеров
+        with transaction.atomic():
+            user = self.generate_data(rng, options["rows"])
+
+            products = Products.objects.order_by("id")[:options["rows"]]
+            carts = Cart.objects.filter(user=user).select_related("product")
+            for name, serializer_class, queryset in (("products", ProductSerializer, products),
+                                                     ("cart", CartSerializer, carts)):
+                context = {"request": request}
+                model_run = lambda: serializer_class(queryset.all(), many=True, context=context).data
+                values_serializer = ValuesSerializer(serializer_class(context=context))
+                values_run = lambda: values_serializer.serialize(values_serializer.get_queryset(queryset.all()))
+
+                if JSONRenderer().render(model_run()) != JSONRenderer().render(values_run()):
+                    raise CommandError(f"{name}: ответы сериализаторов отличаются")
+
+                self.report(f"{name} serializer", [self.measure(model_run) for _ in range(options["repeat"])])
+                self.report(f"{name} values", [self.measure(values_run) for _ in range(options["repeat"])])
+
+                # Отдельно время форматирования, без запроса к БД и создания строк
+                instances = list(queryset.all())
+                rows = list(values_serializer.get_queryset(queryset.all()))
+                self.report(f"{name} serializer (format only)",
+                            [self.measure(lambda: serializer_class(instances, many=True, context=context).data)
+                             for _ in range(options["repeat"])])
+                self.report(f"{name} values (format only)",
+                            [self.measure(lambda: values_serializer.serialize(rows)) for _ in range(options["repeat"])])
+
+            transaction.set_rollback(True)
+
+    def generate_data(self, rng, count):
+        category = Categories.objects.create(name="serializer-benchmark", slug="serializer-benchmark")
+        products = Products.objects.bulk_create([
+            Products(name=f"serializer-benchmark {i}", slug=f"serializer-benchmark-{i}",
+                     description="Описание товара " * rng.randint(1, 20),
+                     image=f"goods_images/benchmark-{i}.jpg" if i % 2 else "",
+                     price=rng.randint(10, 1000), discount=rng.choice([0, 5, 12.5]), category=category)
+            for i in range(count)
+        ])
+        user = User.objects.create(username="serializer-benchmark")
+        Cart.objects.bulk_create([Cart(user=user, product=product, quantity=rng.randint(1, 5))
+                                  for product in products])
+        return user
+
+    def measure(self, run):
+        started = time.perf_counter()
+        run()
+        return (time.perf_counter() - started) * 1000
+
+    def report(self, name, timings):
+        timings.sort()
+        self.stdout.write(
+            f"{name:>32}: mean {statistics.mean(timings):7.2f} ms | "
+            f"p50 {timings[len(timings) // 2]:7.2f} ms | "
+            f"p95 {timings[int(len(timings) * 0.95)]:7.2f} ms"
+        )
@@ -0,0 +1,121 @@
+import asyncio
+import importlib.util
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from goods.models import Categories, Products
+
+
+class Command(BaseCommand):
+    help = ("Сравнивает пропускную способность каталога при N одновременных запросах под WSGI (gunicorn, "
+            "синхронные представления) и ASGI (uvicorn, async-представления). Серверы запускаются на данных "
+            "текущей базы")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=32)
+        parser.add_argument("--requests", type=int, default=1000, help="Запросов на каждый адрес")
+        parser.add_argument("--workers", type=int, default=1, help="Процессов сервера (одинаково для обоих)")
+        parser.add_argument("--threads", type=int, default=8, help="Потоков в процессе gunicorn")
+        parser.add_argument("--port", type=int, default=8765)
+
+    def handle(self, *args, **options):
+        missing = [name for name in ("gunicorn", "uvicorn") if importlib.util.find_spec(name) is None]
+        if missing:
+            raise CommandError(f"Для замера нужны серверы: pip install {' '.join(missing)}")
+
+        product = Products.objects.order_by("id").first()
+        category = Categories.objects.order_by("id").first()
+        if product is None:
+            raise CommandError("В каталоге нет товаров")
+        paths = [
+            "/api/v1/products/",
+            f"/api/v1/products/?category_slug={category.slug}&order_by=-price&page=2",
+            "/api/v1/products/?pagination=cursor&page_size=20",
+            f"/api/v1/products/{product.pk}/",
+            "/catalog/all/",
+            f"/catalog/product/{product.slug}/",
+        ]
+
+        address = ("127.0.0.1", options["port"])
+        bind = f"{address[0]}:{address[1]}"
+        servers = {
+            "wsgi": [sys.executable, "-m", "gunicorn", "eshop.wsgi:application", "--bind", bind,
+                     "--workers", str(options["workers"]), "--worker-class", "gthread",
+                     "--threads", str(options["threads"])],
+            "asgi": [sys.executable, "-m", "uvicorn", "eshop.asgi:application", "--host", address[0],
+                     "--port", str(address[1]), "--workers", str(options["workers"]), "--no-access-log"],
+        }
+        for name, command in servers.items():
+            # Лимиты запросов отключаем: иначе замер упрется в 429
+            env = {**os.environ, "ASYNC_VIEWS": str(name == "asgi"), "DEBUG": "False",
+                   "CATALOG_THROTTLE_ANON": "1000000/min"}
+            server = subprocess.Popen(command, cwd=settings.BASE_DIR, env=env,
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                self.wait_ready(address, server)
+                for path in paths:
+                    asyncio.run(self.load(address, path, options["concurrency"], options["concurrency"]))
+                    started = time.perf_counter()
+                    timings, errors = asyncio.run(self.load(address, path, options["requests"],
+                                                            options["concurrency"]))
+                    self.report(name, path, time.perf_counter() - started, timings, errors)
+            finally:
+                server.terminate()
+                server.wait()
+
+    def wait_ready(self, address, server, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError("Сервер завершился при запуске")
+            try:
+                socket.create_connection(address, timeout=1).close()
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError("Сервер не запустился")
+
+    async def load(self, address, path, count, concurrency):
+        """count запросов GET path через concurrency соединений keep-alive"""
+        queue = iter(range(count))
+        timings, errors = [], []
+
+        async def client():
+            reader, writer = await asyncio.open_connection(*address)
+            # Сайт требует HTTPS - запросы идут как из-за прокси, который снял TLS
+            request = (f"GET {path} HTTP/1.1\r\nHost: localhost\r\nX-Forwarded-Proto: https\r\n"
+                       f"Accept: application/json\r\n\r\n").encode()
+            for _ in queue:
+                started = time.perf_counter()
+                writer.write(request)
+                status = await self.read_response(reader)
+                timings.append((time.perf_counter() - started) * 1000)
+                if status != 200:
+                    errors.append(status)
+            writer.close()
+
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        return timings, errors
+
+    async def read_response(self, reader):
+        head = await reader.readuntil(b"\r\n\r\n")
+        lines = head.decode("latin-1").split("\r\n")
+        headers = dict(line.lower().split(": ", 1) for line in lines[1:] if ": " in line)
+        await reader.readexactly(int(headers.get("content-length", 0)))
+        return int(lines[0].split()[1])
+
+    def report(self, server, path, elapsed, timings, errors):
+        timings.sort()
+        self.stdout.write(
+            f"{server} {path[:60]:<60} {len(timings) / elapsed:8.1f} req/s | "
+            f"mean {statistics.mean(timings):7.2f} ms | p50 {timings[len(timings) // 2]:7.2f} ms | "
+            f"p95 {timings[int(len(timings) * 0.95)]:7.2f} ms"
+            + (f" | ошибок {len(errors)} ({', '.join(map(str, sorted(set(errors))))})" if errors else "")
+        )
@@ -0,0 +1,202 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from goods.utils import CATALOG_PAGE_SIZE, acount_pages, apage
+
+MAX_PAGE_SIZE = 100
+
+
+class ProductsListPagination(PageNumberPagination):
+    page_size = CATALOG_PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = MAX_PAGE_SIZE
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset() для async-представлений"""
+        self.request = request
+        page_size = self.get_page_size(request)
+        paginator = self.django_paginator_class(queryset, page_size)
+        await acount_pages(paginator)
+        page_number = self.get_page_number(request, paginator)
+
+        try:
+            self.page = await apage(paginator, page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        return list(self.page)
+
+
+def estimate_count(queryset):
+    """Оценка количества строк по плану запроса - без COUNT(*) по всей выборке"""
+    return plan_rows(queryset.order_by().explain(format="json"))
+
+
+async def aestimate_count(queryset):
+    return plan_rows(await queryset.order_by().aexplain(format="json"))
+
+
+def plan_rows(plan):
+    return json.loads(plan)[0]["Plan"]["Plan Rows"]
+
+
+class ProductsCursorPagination(BasePagination):
+    """Keyset-пагинация: страница выбирается условием WHERE по значениям полей сортировки
+    последней строки предыдущей страницы, поэтому не нужны ни OFFSET, ни COUNT(*).
+
+    Порядок берется из order_by() выборки и дополняется id, чтобы ключ был уникальным.
+    Количество товаров возвращается только по запросу: count=exact или count=estimate."""
+
+    page_size = CATALOG_PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = MAX_PAGE_SIZE
+    cursor_query_param = "cursor"
+    count_query_param = "count"
+    invalid_cursor_message = "Некорректный курсор"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_queryset = self.get_page_queryset(queryset, request)
+        self.count = self.get_count(queryset)
+        return self.set_page(list(page_queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset() для async-представлений"""
+        page_queryset = self.get_page_queryset(queryset, request)
+        self.count = await self.aget_count(queryset)
+        return self.set_page([row async for row in page_queryset])
+
+    def get_page_queryset(self, queryset, request):
+        """Выборка страницы: на одну строку больше page_size, чтобы узнать, есть ли следующая"""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        values, reverse = self.decode_cursor(cursor) if cursor else (None, False)
+
+        if values is not None:
+            try:
+                queryset = queryset.filter(self.keyset_filter(values, reverse))
+            except (ValidationError, ValueError, TypeError):
+                raise NotFound(self.invalid_cursor_message)
+        ordering = [self.invert(field) for field in self.ordering] if reverse else self.ordering
+
+        self.cursor_values, self.reverse = values, reverse
+        return queryset.order_by(*ordering)[:self.page_size + 1]
+
+    def set_page(self, rows):
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+
+        if self.reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor_values is not None
+
+        self.page = rows
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(request.query_params[self.page_size_query_param], strict=True,
+                                 cutoff=self.max_page_size)
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def get_ordering(self, queryset):
+        ordering = list(queryset.query.order_by or queryset.model._meta.ordering)
+        if ordering[-1].lstrip("-") not in ("id", "pk"):
+            ordering.append("-id" if ordering[-1].startswith("-") else "id")
+        return ordering
+
+    def get_count(self, queryset):
+        mode = self.request.query_params.get(self.count_query_param)
+        if mode == "exact":
+            return queryset.count()
+        if mode == "estimate":
+            return estimate_count(queryset)
+        return None
+
+    async def aget_count(self, queryset):
+        mode = self.request.query_params.get(self.count_query_param)
+        if mode == "exact":
+            return await queryset.acount()
+        if mode == "estimate":
+            return await aestimate_count(queryset)
+        return None
+
+    @staticmethod
+    def invert(field):
+        return field[1:] if field.startswith("-") else f"-{field}"
+
+    def keyset_filter(self, values, reverse):
+        """(a, b) > (x, y) для произвольных направлений сортировки:
+        a >= x AND (a > x OR (a = x AND b > y)).
+        Граница a >= x избыточна логически, но без нее PostgreSQL не превращает OR в диапазон по индексу
+        и читает индекс с начала сортировки"""
+        condition = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip("-")
+            descending = field.startswith("-") != reverse
+            condition |= equal & Q(**{f"{name}__{'lt' if descending else 'gt'}": value})
+            equal &= Q(**{name: value})
+
+        first = self.ordering[0]
+        descending = first.startswith("-") != reverse
+        return Q(**{f"{first.lstrip('-')}__{'lte' if descending else 'gte'}": values[0]}) & condition
+
+    def encode_cursor(self, row, reverse):
+        # Строка - экземпляр модели или словарь из values()
+        get = row.get if isinstance(row, dict) else lambda name: getattr(row, name)
+        values = [str(get(field.lstrip("-"))) for field in self.ordering]
+        cursor = json.dumps({"v": values, "r": reverse}, separators=(",", ":"))
+        return urlsafe_b64encode(cursor.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            data = json.loads(urlsafe_b64decode(cursor.encode()))
+            values, reverse = data["v"], bool(data["r"])
+        except (BinasciiError, ValueError, TypeError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return values, reverse
+
+    def get_link(self, row, reverse):
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, "page")
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(row, reverse))
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.get_link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.get_link(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        response = {
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        }
+        if self.count is not None:
+            response = {"count": self.count, **response}
+        return Response(response)
@@ -0,0 +1,105 @@
+import csv
+import io
+
+import msgpack
+import orjson
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSONRenderer на orjson. Типы, которые orjson не знает или форматирует иначе (Decimal, даты,
+    ленивые строки), передаются в JSONEncoder DRF; целые больше 64 бит - через JSONRenderer целиком.
+
+    Отличия от JSONRenderer - только у float: запись короче при том же значении (1e16, а не 1e+16; 1e-7,
+    а не 1e-07), NaN и Infinity становятся null, а не ошибкой. Цены и суммы в API - Decimal, их это не касается"""
+
+    options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        # Отступы (Accept: application/json; indent=4 и Browsable API) - через стандартный json
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=self.options)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        return ret.replace("\u2028".encode(), b"\\u2028").replace("\u2029".encode(), b"\\u2029")
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Компактный бинарный формат с теми же данными, что и JSON: Decimal и даты
+    преобразуются так же, как в JSONRenderer"""
+
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+    encoder_class = JSONRenderer.encoder_class
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=self.encoder_class().default, datetime=False)
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Одна JSON-строка на объект. stream() отдает строки пачками по buffer_size байт - для потоковых ответов"""
+
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    charset = None
+    encoder_class = JSONRenderer.encoder_class
+    buffer_size = 64 * 1024
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return b"".join(self.stream(data if isinstance(data, list) else [data]))
+
+    def stream(self, rows):
+        default = self.encoder_class().default
+        options = ORJSONRenderer.options | orjson.OPT_APPEND_NEWLINE
+        buffer, size = [], 0
+        for row in rows:
+            line = orjson.dumps(row, default=default, option=options)
+            buffer.append(line)
+            size += len(line)
+            if size >= self.buffer_size:
+                yield b"".join(buffer)
+                buffer, size = [], 0
+        if buffer:
+            yield b"".join(buffer)
+
+
+class CSVRenderer(BaseRenderer):
+    """CSV с заголовком из ключей первого объекта, stream() - пачками по buffer_size символов"""
+
+    media_type = "text/csv"
+    format = "csv"
+    charset = "utf-8"
+    buffer_size = 64 * 1024
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return b"".join(self.stream(data if isinstance(data, list) else [data]))
+
+    def stream(self, rows):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        header = None
+        for row in rows:
+            if header is None:
+                header = list(row)
+                writer.writerow(header)
+            writer.writerow([row[name] for name in header])
+            if buffer.tell() >= self.buffer_size:
+                yield buffer.getvalue().encode(self.charset)
+                buffer.seek(0)
+                buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode(self.charset)
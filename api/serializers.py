@@ -1,17 +1,60 @@
 
+import re
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.storage import FileSystemStorage
+from django.db.models import F
+from django.db.models.functions import Round
+from django.utils.text import Truncator
 from rest_framework import serializers
 
 from carts.models import Cart
+from carts.utils import MAX_CART_QUANTITY
 from goods.models import Products
 from orders.models import OrderItem, Order
 from users.models import User
 
 
+class TruncatedCharField(serializers.CharField):
+    def __init__(self, length, **kwargs):
+        self.length = length
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return Truncator(super().to_representation(value)).chars(self.length)
+
+
 class ProductSerializer(serializers.ModelSerializer):
+    # Числом, как и раньше, когда sell_price был методом модели
+    sell_price = serializers.FloatField(read_only=True)
+
     class Meta:
         model = Products
         fields = ("pk", "name", "slug", "description", "image", "price", "discount", "sell_price", )
 
+    def __init__(self, *args, fields=None, description_length=None, **kwargs):
+        """fields - оставить в ответе только эти поля, description_length - обрезать описание"""
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+        if description_length and "description" in self.fields:
+            self.fields["description"] = TruncatedCharField(description_length, read_only=True, allow_null=True)
+
+
+class ProductExportSerializer(ProductSerializer):
+    """Товар для выгрузки каталога: с остатком, категорией и временем изменения"""
+    category = serializers.CharField(source="category.slug", read_only=True)
+
+    class Meta(ProductSerializer.Meta):
+        fields = ProductSerializer.Meta.fields + ("quantity", "category", "updated_timestamp", )
+
+
+class ProductSuggestSerializer(ProductSerializer):
+    """Сокращенный сериализатор товара для подсказок поиска"""
+    class Meta(ProductSerializer.Meta):
+        fields = ("pk", "name", "slug", "sell_price", )
+
 
 class UserProfileSerializer(serializers.ModelSerializer):
     class Meta:
@@ -29,6 +72,8 @@ class CartSerializer(serializers.ModelSerializer):
     """Сериализатор для корзины (только чтение)"""
     product = ProductSerializer(read_only=True)
     total_price = serializers.SerializerMethodField()
+    # То же значение, что и get_total_price, но посчитанное в SQL - для ValuesSerializer
+    values_annotations = {"total_price": Round(F("product__sell_price") * F("quantity"), 2)}
 
     class Meta:
         model = Cart
@@ -38,6 +83,25 @@ class CartSerializer(serializers.ModelSerializer):
         return obj.products_price()
 
 
+class CartOpSerializer(serializers.Serializer):
+    """Одна операция с корзиной: add - добавить quantity штук, set - установить количество (0 - удалить),
+    remove - удалить товар"""
+    op = serializers.ChoiceField(choices=["add", "set", "remove"])
+    product_id = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=0, max_value=MAX_CART_QUANTITY, default=1)
+
+
+class CartOpsSerializer(serializers.Serializer):
+    ops = serializers.ListField(child=CartOpSerializer(), min_length=1, max_length=50)
+
+    def validate_ops(self, ops):
+        product_ids = {op["product_id"] for op in ops}
+        missing = product_ids - set(Products.objects.filter(pk__in=product_ids).values_list("pk", flat=True))
+        if missing:
+            raise serializers.ValidationError(f"Нет товаров: {', '.join(map(str, sorted(missing)))}.")
+        return ops
+
+
 class OrderItemSerializer(serializers.ModelSerializer):
     total_price = serializers.SerializerMethodField()
 
@@ -50,7 +114,8 @@ class OrderItemSerializer(serializers.ModelSerializer):
 
 
 class OrderListSerializer(serializers.ModelSerializer):
-    total_amount = serializers.SerializerMethodField()
+    # Аннотация Order.objects.with_totals(); числом, как и раньше
+    total_amount = serializers.FloatField(read_only=True)
 
     class Meta:
         model = Order
@@ -58,13 +123,10 @@ class OrderListSerializer(serializers.ModelSerializer):
             'id', 'created_timestamp', 'payment_on_get', 'status', 'total_amount'
         ]
 
-    def get_total_amount(self, obj):
-        return obj.orderitem_set.total_price()
-
 
 class OrderDetailSerializer(serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True, source='orderitem_set')
-    total_amount = serializers.SerializerMethodField()
+    total_amount = serializers.FloatField(read_only=True)
 
     class Meta:
         model = Order
@@ -74,5 +136,83 @@ class OrderDetailSerializer(serializers.ModelSerializer):
             'items', 'total_amount'
         ]
 
-    def get_total_amount(self, obj):
-        return obj.orderitem_set.total_price()
+
+SIMPLE_FILE_NAME_RE = re.compile(r"[\w\-.]+(/[\w\-.]+)*\Z", re.ASCII)
+
+
+class ValuesSerializer:
+    """Быстрая сериализация списков только для чтения. Строки выбираются через values() без создания
+    экземпляров моделей, а каждое поле форматируется to_representation поля исходного сериализатора,
+    подготовленным один раз на весь список. Результат совпадает с serializer(many=True).data.
+
+    SerializerMethodField поддерживаются только через values_annotations сериализатора."""
+
+    def __init__(self, serializer, prefix=""):
+        self.converters = []  # (имя поля в ответе, ключ в values() или вложенный ValuesSerializer, функция)
+        self.annotations = {}
+        model = serializer.Meta.model
+        request = serializer.context.get("request")
+
+        for name, field in serializer.fields.items():
+            # source="category.slug" -> ключ values() "category__slug"
+            source = f"{prefix}{field.source.replace('.', '__')}"
+            if isinstance(field, serializers.BaseSerializer):
+                self.converters.append((name, ValuesSerializer(field, prefix=f"{source}__"), None))
+            elif isinstance(field, serializers.SerializerMethodField):
+                if prefix or name not in getattr(serializer, "values_annotations", {}):
+                    raise ImproperlyConfigured(f"{type(serializer).__name__}.{name}: нет values_annotations")
+                self.annotations[name] = serializer.values_annotations[name]
+                self.converters.append((name, name, None))
+            elif isinstance(field, serializers.FileField):
+                self.converters.append((name, source, self.file_url(model, field, request)))
+            else:
+                self.converters.append((name, source, field.to_representation))
+
+    @staticmethod
+    def file_url(model, field, request):
+        # Как FileField.to_representation, только по имени файла вместо FieldFile
+        storage = model._meta.get_field(field.source).storage
+
+        def to_representation(name):
+            if not name:
+                return None
+            url = storage.url(name)
+            return request.build_absolute_uri(url) if request is not None else url
+
+        if not isinstance(storage, FileSystemStorage):
+            return to_representation
+
+        # Для локального хранилища и имен без спецсимволов и относительных сегментов URL - это
+        # префикс MEDIA_URL (абсолютный, если есть запрос) плюс имя: urljoin и экранирование ничего не меняют
+        prefix = to_representation("-")[:-1]
+
+        def fast_to_representation(name):
+            if name and SIMPLE_FILE_NAME_RE.match(name) and "./" not in name:
+                return prefix + name
+            return to_representation(name)
+        return fast_to_representation
+
+    def get_value_names(self):
+        names = []
+        for _, key, _ in self.converters:
+            names.extend(key.get_value_names() if isinstance(key, ValuesSerializer) else [key])
+        return names
+
+    def get_queryset(self, queryset, *extra):
+        """Выборка словарей со всеми нужными значениями; extra - дополнительные ключи (например, для курсора)"""
+        names = dict.fromkeys([*self.get_value_names(), *extra])
+        return queryset.annotate(**self.annotations).values(*names)
+
+    def to_representation(self, row):
+        data = {}
+        for name, key, convert in self.converters:
+            if isinstance(key, ValuesSerializer):
+                data[name] = key.to_representation(row)
+            elif row[key] is None:
+                data[name] = None
+            else:
+                data[name] = convert(row[key]) if convert is not None else row[key]
+        return data
+
+    def serialize(self, rows):
+        return [self.to_representation(row) for row in rows]
@@ -1,3 +1,240 @@
-from django.test import TestCase
+import gzip
+import random
+from decimal import Decimal
+from types import SimpleNamespace
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.pagination import ProductsCursorPagination
+from api.renderers import ORJSONRenderer
+from api.views import ProductsListView
+from carts.models import Cart
+from carts.storage import SessionCartStore
+from goods.models import Categories, Products
+from eshop.middleware import CompressionMiddleware
+from goods.utils import CATALOG_PAGE_SIZE
+from users.models import User
+
+# Свои кэши на время тестов: в общих могут остаться товары, корзины и счетчики ограничений из других баз
+TEST_CACHES = {alias: {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": f"test-{alias}"}
+               for alias in settings.CACHES}
+
+
+# Свой кэш на время тестов: в общем кэше могут остаться категории из других баз
+@override_settings(CACHES={**settings.CACHES, "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class ProductsSortingTest(TestCase):
+    products_count = 20000
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(0)
+        cls.categories = Categories.objects.bulk_create(
+            [Categories(name=f"Категория {i}", slug=f"category-{i}") for i in range(10)]
+        )
+        Products.objects.bulk_create(
+            [
+                Products(name=f"Товар {i}", slug=f"product-{i}", description="Описание товара",
+                         price=rng.randint(10, 1000), discount=rng.choice([0, 0, 0, 5, 10, 25]),
+                         quantity=rng.randint(0, 20), category=rng.choice(cls.categories))
+                for i in range(cls.products_count)
+            ],
+            batch_size=5000,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE product")
+
+    def get_queryset(self, **params):
+        request = Request(APIRequestFactory().get("/api/v1/products/", params))
+        view = ProductsListView(request=request, args=(), kwargs={}, format_kwarg=None)
+        return view.get_queryset()
+
+    def test_allowed_sorts_use_indexes(self):
+        for order_by in ProductsListView.ordering_fields:
+            for category_slug in ("all", self.categories[3].slug):
+                with self.subTest(order_by=order_by, category_slug=category_slug):
+                    queryset = self.get_queryset(order_by=order_by, category_slug=category_slug)
+                    plan = queryset[:CATALOG_PAGE_SIZE].explain()
+
+                    self.assertIn("Index", plan)
+                    self.assertNotIn("Seq Scan", plan)
+
+    def test_cursor_pages_use_index_range(self):
+        # Далекая страница курсорной пагинации должна начинаться с позиции курсора в индексе,
+        # а не с начала сортировки
+        for order_by in ProductsListView.ordering_fields:
+            for category_slug in ("all", self.categories[3].slug):
+                for reverse in (False, True):
+                    with self.subTest(order_by=order_by, category_slug=category_slug, reverse=reverse):
+                        queryset = self.get_queryset(order_by=order_by, category_slug=category_slug)
+                        pagination = ProductsCursorPagination()
+                        pagination.ordering = pagination.get_ordering(queryset)
+                        cursor = pagination.encode_cursor(queryset[500], reverse)
+                        request = Request(APIRequestFactory().get("/api/v1/products/", {"cursor": cursor}))
+                        plan = pagination.get_page_queryset(queryset, request).explain()
+
+                        first_field = pagination.ordering[0].lstrip("-")
+                        index_conditions = [line for line in plan.splitlines() if "Index Cond" in line]
+                        self.assertTrue(any(first_field in line for line in index_conditions), plan)
+                        self.assertNotIn("Seq Scan", plan)
+
+    def test_unknown_sort_is_rejected(self):
+        response = self.client.get("/api/v1/products/", {"order_by": "description"}, secure=True)
+
+        self.assertEqual(response.status_code, 400)
+
+
+class ORJSONRendererTest(SimpleTestCase):
+    def render(self, renderer, data):
+        return renderer.render(data, "application/json")
+
+    def test_matches_json_renderer(self):
+        data = {"price": Decimal("1234.50"), "name": "Диван\u2028", "count": 2 ** 63 - 1, "big": 2 ** 70,
+                "values": [1.5, None, True]}
+
+        self.assertEqual(self.render(ORJSONRenderer(), data), self.render(JSONRenderer(), data))
+
+    def test_float_differences(self):
+        # Известные отличия от JSONRenderer: короче запись float и null вместо ошибки для NaN/Infinity
+        self.assertEqual(self.render(ORJSONRenderer(), [1e16, 1e-7]), b"[1e16,1e-7]")
+        self.assertEqual(self.render(JSONRenderer(), [1e16, 1e-7]), b"[1e+16,1e-07]")
+
+        self.assertEqual(self.render(ORJSONRenderer(), [float("nan"), float("inf")]), b"[null,null]")
+        with self.assertRaises(ValueError):
+            self.render(JSONRenderer(), [float("nan")])
+
+
+class CompressionMiddlewareTest(SimpleTestCase):
+    def get_encoding(self, content_type):
+        request = RequestFactory().get("/", HTTP_ACCEPT_ENCODING="gzip, br")
+        middleware = CompressionMiddleware(lambda request: HttpResponse("товар " * 1000, content_type=content_type))
+        return middleware(request)["Content-Encoding"]
+
+    def test_brotli_only_for_api_content(self):
+        self.assertEqual(self.get_encoding("application/json"), "br")
+        # HTML - gzip со случайной длиной из GZipMiddleware (защита от BREACH)
+        self.assertEqual(self.get_encoding("text/html; charset=utf-8"), "gzip")
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CompressionStackTest(TestCase):
+    """Сжатие через весь MIDDLEWARE: CsrfViewMiddleware обрабатывает ответ раньше CompressionMiddleware"""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Categories.objects.create(name="Столы", slug="stoly")
+        cls.products = Products.objects.bulk_create(
+            [Products(name=f"Стол {i}", slug=f"stol-{i}", description="Обеденный стол из массива дуба " * 3,
+                      price=100, quantity=10, category=category) for i in range(20)]
+        )
+
+    def get(self, path, data=None):
+        return self.client.get(path, data, secure=True, HTTP_ACCEPT_ENCODING="gzip, br")
+
+    def test_brotli_for_json_without_token(self):
+        response = self.get("/api/v1/products/", {"page_size": 20})
+
+        self.assertEqual(response["Content-Encoding"], "br")
+
+    def test_no_brotli_when_response_has_csrf_token(self):
+        self.client.post(reverse("cart:cart_add"), {"product_id": self.products[0].pk}, secure=True)
+
+        # Без версии ответ содержит разметку корзины с {% csrf_token %}; в анонимной корзине id строки - id товара
+        response = self.client.post(reverse("cart:cart_change"), {"cart_id": self.products[0].pk, "quantity": 2},
+                                    secure=True, HTTP_ACCEPT_ENCODING="gzip, br")
+
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn(b"csrfmiddlewaretoken", gzip.decompress(response.content))
+
+
+class CostRateThrottleTest(TestCase):
+    @override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": {"catalog_anon": "5/min"}})
+    def test_forwarded_for_does_not_reset_budget(self):
+        # Без NUM_PROXIES клиент - REMOTE_ADDR: подставной X-Forwarded-For не дает нового ведра
+        statuses = [self.client.get("/api/v1/products/", secure=True, HTTP_X_FORWARDED_FOR=f"10.0.0.{i}").status_code
+                    for i in range(10)]
+
+        self.assertEqual(statuses.count(200), 5)
+        self.assertEqual(statuses.count(429), 5)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ProductsQueryParamsTest(TestCase):
+    def get_status(self, path, **params):
+        return self.client.get(path, params, secure=True).status_code
+
+    def test_description_length_must_be_decimal(self):
+        self.assertEqual(self.get_status("/api/v1/products/", description_length="20"), 200)
+        # "²".isdigit() - True, но int("²") - ValueError
+        for value in ("²", "-1", "0", "1001"):
+            with self.subTest(value=value):
+                self.assertEqual(self.get_status("/api/v1/products/", description_length=value), 400)
+
+    def test_batch_ids_must_be_decimal(self):
+        self.assertEqual(self.get_status("/api/v1/products/batch/", ids="1,2"), 200)
+        for value in ("²", "1,²", "1,a", ""):
+            with self.subTest(value=value):
+                self.assertEqual(self.get_status("/api/v1/products/batch/", ids=value), 400)
+
+    def test_page_with_superscript_digit(self):
+        # Номер страницы влияет на цену запроса в ограничителе - там он тоже не должен падать на int()
+        self.assertEqual(self.get_status("/api/v1/products/", page="²"), 404)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CartOpsViewTest(TestCase):
+    ops = [
+        {"op": "add", "product_id": 0, "quantity": 3},
+        {"op": "add", "product_id": 1},
+        {"op": "set", "product_id": 0, "quantity": 2},
+        {"op": "remove", "product_id": 1},
+        {"op": "add", "product_id": 2, "quantity": 4},
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Categories.objects.create(name="Стулья", slug="stulya")
+        cls.products = Products.objects.bulk_create(
+            [Products(name=f"Стул {i}", slug=f"stul-{i}", price=10 * (i + 1), quantity=10, category=category)
+             for i in range(3)]
+        )
+
+    def apply_ops(self):
+        ops = [{**op, "product_id": self.products[op["product_id"]].pk} for op in self.ops]
+        response = self.client.post("/api/v1/cart/ops/", {"ops": ops}, content_type="application/json", secure=True)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def assertCart(self, totals, quantities):
+        self.assertEqual(dict(quantities), {self.products[0].pk: 2, self.products[2].pk: 4})
+        self.assertEqual(totals["total_quantity"], 6)
+        self.assertEqual(Decimal(str(totals["total_amount"])), Decimal("140"))
+
+    def test_ops_for_user(self):
+        user = User.objects.create_user(username="buyer")
+        self.client.force_login(user)
+
+        totals = self.apply_ops()
+
+        self.assertCart(totals, Cart.objects.filter(user=user).values_list("product_id", "quantity"))
+
+    def test_ops_for_anonymous_session(self):
+        totals = self.apply_ops()
+
+        session = SessionStore(self.client.session.session_key)
+        self.assertCart(totals, SessionCartStore(SimpleNamespace(session=session)).quantities())
+        self.assertFalse(Cart.objects.exists())
+
+    def test_unknown_product_rejected(self):
+        response = self.client.post("/api/v1/cart/ops/", {"ops": [{"op": "add", "product_id": 10 ** 6}]},
+                                    content_type="application/json", secure=True)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Cart.objects.exists())
@@ -0,0 +1,75 @@
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.crypto import constant_time_compare
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+# Стоимость запросов в токенах
+LIST_COST = 1
+SEARCH_COST = 5
+EXPORT_COST = 60
+# Каждые DEEP_PAGE_STEP страниц номерной пагинации (OFFSET) добавляют токен к стоимости
+DEEP_PAGE_STEP = 10
+
+DURATIONS = {"s": 1, "m": 60, "h": 60 * 60, "d": 24 * 60 * 60}
+
+
+class CostRateThrottle(BaseThrottle):
+    """Token bucket по клиенту, у каждого запроса своя стоимость - view.get_throttle_cost(request).
+
+    Ведро вмещает N токенов и пополняется со скоростью N за период (rate "N/период" из DEFAULT_THROTTLE_RATES).
+    Состояние - одно число в кэше throttle (Redis, общий для процессов): момент, когда ведро снова станет полным. Запрос
+    сдвигает этот момент на стоимость запроса; если он уходит дальше, чем на весь период, ведро пусто.
+    Операции с кэшем не атомарны: при одновременных запросах одного клиента часть списаний может потеряться.
+
+    Клиент - пользователь (по токену или сессии), пользователь Telegram (запросы бота с ключом BOT_API_KEY
+    и заголовком X-Telegram-Id) или IP-адрес (X-Forwarded-For учитывается только с NUM_PROXIES)."""
+
+    cache_format = "throttle:%(scope)s:%(ident)s"
+    scope = "catalog"
+
+    @property
+    def cache(self):
+        return caches[settings.THROTTLE_CACHE_ALIAS]
+
+    def get_client(self, request):
+        """(тип клиента для выбора rate, идентификатор)"""
+        if request.user and request.user.is_authenticated:
+            return "user", f"user:{request.user.pk}"
+
+        telegram_id = request.headers.get("X-Telegram-Id", "")
+        bot_key = request.headers.get("X-Bot-Key", "")
+        if telegram_id.isdecimal() and settings.BOT_API_KEY and constant_time_compare(bot_key, settings.BOT_API_KEY):
+            return "user", f"telegram:{telegram_id}"
+
+        return "anon", f"ip:{self.get_ident(request)}"
+
+    def parse_rate(self, rate):
+        num, period = rate.split("/")
+        return int(num), DURATIONS[period[0]]
+
+    def allow_request(self, request, view):
+        kind, ident = self.get_client(request)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(f"{self.scope}_{kind}")
+        if rate is None:
+            return True
+
+        capacity, duration = self.parse_rate(rate)
+        # Дороже полного ведра запрос не бывает: иначе он не прошел бы никогда
+        cost = min(getattr(view, "get_throttle_cost", lambda request: LIST_COST)(request), capacity)
+
+        key = self.cache_format % {"scope": self.scope, "ident": ident}
+        now = time.time()
+        full_at = max(self.cache.get(key, now), now) + cost * duration / capacity
+        if full_at - now > duration:
+            self.wait_time = full_at - now - duration
+            return False
+
+        self.cache.set(key, full_at, math.ceil(full_at - now))
+        return True
+
+    def wait(self):
+        return self.wait_time
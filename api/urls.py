@@ -1,11 +1,23 @@
+from django.conf import settings
 from django.urls import path
 
 from api.views import *
 
+# Под ASGI (eshop/asgi.py) список и карточку товара обслуживают async-представления
+if settings.ASYNC_VIEWS:
+    products_list_view, product_detail_view = AsyncProductsListView, AsyncProductDetailView
+else:
+    products_list_view, product_detail_view = ProductsListView, ProductDetailView
+
 urlpatterns = [
-    path("api/v1/products/", ProductsListView.as_view()),
-    path('api/v1/products/<int:pk>/', ProductDetailView.as_view()),
+    path("api/v1/products/", products_list_view.as_view()),
+    path("api/v1/products/suggest/", ProductSuggestView.as_view()),
+    path("api/v1/products/facets/", ProductFacetsView.as_view()),
+    path("api/v1/products/batch/", ProductBatchView.as_view()),
+    path("api/v1/products/export/", ProductExportView.as_view()),
+    path('api/v1/products/<int:pk>/', product_detail_view.as_view()),
     path('api/v1/cart/', CartListView.as_view()),
+    path('api/v1/cart/ops/', CartOpsView.as_view()),
     path('api/v1/orders/', OrdersListView.as_view()),
     path('api/v1/orders/<int:pk>/', OrderDetailView.as_view())
 ]
\ No newline at end of file
@@ -1,87 +1,381 @@
-from django.http import Http404
+import inspect
+from hashlib import md5
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
 from rest_framework import generics, permissions
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.authentication import get_authorization_header
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from api.serializers import ProductSerializer, CartSerializer, OrderListSerializer, OrderDetailSerializer
-from carts.models import Cart
+from api.export import aiter_chunks, export_products, parse_since
+from api.pagination import ProductsListPagination, ProductsCursorPagination
+from api.renderers import CSVRenderer, NDJSONRenderer
+from api.throttling import CostRateThrottle, DEEP_PAGE_STEP, EXPORT_COST, LIST_COST, SEARCH_COST
+from api.serializers import (ProductSerializer, ProductSuggestSerializer, CartSerializer, CartOpsSerializer,
+                             OrderListSerializer, OrderDetailSerializer, ValuesSerializer)
+from carts.models import cart_totals
+from carts.storage import DatabaseCartStore, get_cart_store
+from goods.cache import aget_product, get_catalog_version, get_product, get_products_by_pk
+from goods.mixins import AsyncProductsFilterMixin, ProductsFilterMixin
 from goods.models import Products
-from goods.utils import q_search
+from goods.utils import (q_suggest, normalize_query, product_etag, product_facets, SUGGEST_LIMIT,
+                         SUGGEST_MAX_LIMIT, SUGGEST_MIN_LENGTH)
 from orders.models import Order
 
 
-class ProductsListPagination(PageNumberPagination):
-    page_size = 3
+class AsyncAPIViewMixin:
+    """dispatch() для async-представлений только на чтение. APIView вызывает обработчики синхронно,
+    поэтому здесь тот же цикл запроса, что в APIView.dispatch(), но обработчик - корутина.
+    Пользователь сессии загружается через async ORM; заголовок Authorization (токен, Basic) проверяется
+    синхронными аутентификаторами DRF в потоке"""
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await self.ainitial(request, *args, **kwargs)
+            handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            response = handler(request, *args, **kwargs)
+            if inspect.isawaitable(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def ainitial(self, request, *args, **kwargs):
+        request._request.user = await request._request.auser()
+        if get_authorization_header(request):
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+        else:
+            # Без Authorization аутентифицирует только сессия, а ее пользователь уже загружен
+            self.initial(request, *args, **kwargs)
+
+
+class ValuesListMixin:
+    """list() через ValuesSerializer: строки из values() без создания экземпляров моделей"""
+
+    def list(self, request, *args, **kwargs):
+        serializer, queryset = self.get_values_queryset()
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serializer.serialize(page))
+        return Response(serializer.serialize(queryset))
+
+    def get_values_queryset(self):
+        serializer = ValuesSerializer(self.get_serializer())
+        queryset = self.filter_queryset(self.get_queryset())
+        # Поля сортировки тоже выбираются: по ним курсорная пагинация строит ссылки
+        ordering = [name.lstrip("-") for name in queryset.query.order_by]
+        return serializer, serializer.get_queryset(queryset, *ordering, "id")
+
+
+class ProductsApiFilterMixin(ProductsFilterMixin):
+    throttle_classes = [CostRateThrottle]
+
+    def get_throttle_cost(self, request):
+        return SEARCH_COST if request.GET.get("q") else LIST_COST
+
+    def get_price_param(self, name):
+        value = super().get_price_param(name)
+        if value is None and self.request.GET.get(name):
+            raise ValidationError({name: "Введите число."})
+        return value
 
+    def get_ordering(self):
+        order_by = self.request.GET.get("order_by") or "default"
+        if order_by not in self.ordering_fields:
+            raise ValidationError({"order_by": f"Допустимые значения: {', '.join(self.ordering_fields)}."})
+        return super().get_ordering()
 
-class ProductsListView(generics.ListAPIView):
+
+class ProductsListView(ValuesListMixin, ProductsApiFilterMixin, generics.ListAPIView):
     serializer_class = ProductSerializer
     queryset = Products.objects.all()
     pagination_class = ProductsListPagination
+    max_description_length = 1000
 
-    def get_queryset(self):
-        category_slug = self.request.GET.get("category_slug")
-        on_sale = self.request.GET.get("on_sale")
-        order_by = self.request.GET.get("order_by")
-        query = self.request.GET.get("q")
-
-        if query:
-            goods = q_search(query)
-        elif category_slug == "all" or not category_slug:
-            goods = super().get_queryset()
-        else:
-            goods = super().get_queryset().filter(category__slug=category_slug)
-            if not goods:
-                raise Http404()
+    def get_throttle_cost(self, request):
+        # Номерная пагинация - это OFFSET: чем дальше страница, тем дороже запрос
+        cost = super().get_throttle_cost(request)
+        page = request.GET.get("page", "")
+        if page.isdecimal():
+            cost += int(page) // DEEP_PAGE_STEP
+        return cost
+
+    @property
+    def paginator(self):
+        # Курсорная пагинация включается параметром pagination=cursor (или наличием cursor)
+        if not hasattr(self, "_paginator"):
+            if self.request.GET.get("pagination") == "cursor" or "cursor" in self.request.GET:
+                self._paginator = ProductsCursorPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
 
-        if on_sale:
-            goods = goods.filter(discount__gt=0)
+    def get_queryset(self):
+        goods = self.order_products(self.filter_by_category(self.search_products()))
 
-        if order_by and order_by != "default":
-            goods = goods.order_by(order_by)
+        fields = self.get_fields_param()
+        if fields:
+            # В SELECT только запрошенные колонки и поля сортировки - по ним строится курсор
+            ordering = [name.lstrip("-") for name in goods.query.order_by if name.lstrip("-") != "rank"]
+            goods = goods.only(*("id" if name == "pk" else name for name in fields), *ordering)
         return goods
 
+    def get_fields_param(self):
+        """Список полей из параметра fields (через запятую) или None - все поля"""
+        if not self.request.GET.get("fields"):
+            return None
+
+        fields = [name.strip() for name in self.request.GET["fields"].split(",") if name.strip()]
+        unknown = set(fields) - set(self.serializer_class.Meta.fields)
+        if unknown:
+            raise ValidationError({"fields": f"Неизвестные поля: {', '.join(sorted(unknown))}."})
+        return fields
+
+    def get_description_length(self):
+        value = self.request.GET.get("description_length")
+        if not value:
+            return None
+        if not value.isdecimal() or not 0 < int(value) <= self.max_description_length:
+            raise ValidationError({"description_length": f"Целое число от 1 до {self.max_description_length}."})
+        return int(value)
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault("fields", self.get_fields_param())
+        kwargs.setdefault("description_length", self.get_description_length())
+        return super().get_serializer(*args, **kwargs)
+
+    def get_etag(self, request):
+        """Слабый ETag из версии каталога и нормализованных параметров запроса.
+        Хост и формат тоже входят в ключ: от них зависят ссылки next/previous и тело ответа"""
+        params = sorted((name, normalize_query(value) if name == "q" else value)
+                        for name, value in request.GET.items() if value)
+        value = repr((get_catalog_version(), request.build_absolute_uri("/"), request.accepted_renderer.format, params))
+        return "W/" + quote_etag(md5(value.encode()).hexdigest())
+
+    def list(self, request, *args, **kwargs):
+        # Совпавший ETag отдаем до построения выборки и сериализации
+        etag = self.get_etag(request)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = super().list(request, *args, **kwargs)
+        return self.set_cache_headers(response, etag)
+
+    def set_cache_headers(self, response, etag):
+        response.headers["ETag"] = etag
+        # Браузер хранит ответ, но перед каждым использованием переспрашивает сервер с If-None-Match
+        patch_cache_control(response, no_cache=True)
+        return response
+
+
+class AsyncProductsListView(AsyncAPIViewMixin, AsyncProductsFilterMixin, ProductsListView):
+    """ProductsListView для ASGI: COUNT(*) и страница товаров выбираются через async ORM"""
+
+    async def get(self, request, *args, **kwargs):
+        etag = self.get_etag(request)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            await self.aload_categories()
+            serializer, queryset = await self.abuild_queryset(self.get_values_queryset)
+            page = await self.paginator.apaginate_queryset(queryset, request, view=self)
+            response = self.get_paginated_response(serializer.serialize(page))
+        return self.set_cache_headers(response, etag)
+
+
+class ProductFacetsView(ProductsApiFilterMixin, APIView):
+    cache_timeout = 60
+
+    def get(self, request, *args, **kwargs):
+        params = [normalize_query(request.GET.get(name, ""))
+                  for name in ("q", "category_slug", "on_sale", "min_price", "max_price")]
+        cache_key = f"products:facets:{md5(repr(params).encode()).hexdigest()}"
+
+        facets = cache.get(cache_key)
+        if facets is None:
+            category_slug = None if request.GET.get("q") else request.GET.get("category_slug")
+            facets = product_facets(self.search_products(), category_slug)
+            cache.set(cache_key, facets, self.cache_timeout)
+
+        response = Response(facets)
+        patch_cache_control(response, max_age=self.cache_timeout)
+        return response
+
+
+class ProductSuggestView(generics.ListAPIView):
+    serializer_class = ProductSuggestSerializer
+    throttle_classes = [CostRateThrottle]
+    cache_timeout = 60 * 5
+
+    def list(self, request, *args, **kwargs):
+        prefix = normalize_query(request.GET.get("q", ""))
+        if len(prefix) < SUGGEST_MIN_LENGTH:
+            return Response([])
+
+        try:
+            limit = min(max(int(request.GET.get("limit", SUGGEST_LIMIT)), 1), SUGGEST_MAX_LIMIT)
+        except ValueError:
+            limit = SUGGEST_LIMIT
+
+        cache_key = f"products:suggest:{limit}:{md5(prefix.encode()).hexdigest()}"
+        data = cache.get(cache_key)
+        if data is None:
+            products = q_suggest(prefix, limit)
+            if products is None:
+                # Не уложились в бюджет времени - отдаем пустой ответ и не кэшируем его
+                return Response([])
+            data = self.get_serializer(products, many=True).data
+            cache.set(cache_key, data, self.cache_timeout)
+
+        return Response(data)
+
+
+class ProductBatchView(APIView):
+    """Несколько товаров по списку id за один запрос: ?ids=1,2,3"""
+    throttle_classes = [CostRateThrottle]
+    max_ids = 50
+
+    def get(self, request, *args, **kwargs):
+        ids = self.get_ids()
+        products = get_products_by_pk(ids)
+        serializer = ProductSerializer([products[pk] for pk in ids if pk in products], many=True,
+                                       context={"request": request})
+        return Response({
+            "results": serializer.data,
+            "missing": [pk for pk in ids if pk not in products],
+        })
+
+    def get_ids(self):
+        values = [value.strip() for value in self.request.GET.get("ids", "").split(",") if value.strip()]
+        if not values or not all(value.isdecimal() for value in values):
+            raise ValidationError({"ids": "Список id товаров через запятую."})
+        if len(values) > self.max_ids:
+            raise ValidationError({"ids": f"Не больше {self.max_ids} id за запрос."})
+        # Повторы убираем, порядок сохраняем
+        return list(dict.fromkeys(int(value) for value in values))
+
+
+class ProductExportView(APIView):
+    """Потоковая выгрузка всего каталога: NDJSON (по умолчанию) или CSV - через Accept или ?format=csv.
+    since= - только товары, измененные с указанного момента"""
+    renderer_classes = [NDJSONRenderer, CSVRenderer]
+    throttle_classes = [CostRateThrottle]
+
+    def get_throttle_cost(self, request):
+        return EXPORT_COST
+
+    def get(self, request, *args, **kwargs):
+        since = None
+        if request.GET.get("since"):
+            since = parse_since(request.GET["since"])
+            if since is None:
+                raise ValidationError({"since": "Дата и время в формате ISO 8601."})
+
+        renderer = request.accepted_renderer
+        content_type = f"{renderer.media_type}; charset={renderer.charset}" if renderer.charset else renderer.media_type
+        chunks = renderer.stream(export_products(since, request))
+        if isinstance(request._request, ASGIRequest):
+            chunks = aiter_chunks(chunks)
+        response = StreamingHttpResponse(chunks, content_type=content_type)
+        response.headers["Content-Disposition"] = f'attachment; filename="products.{renderer.format}"'
+        return response
+
 
 class ProductDetailView(generics.RetrieveAPIView):
     serializer_class = ProductSerializer
     queryset = Products.objects.all()
     lookup_field = 'pk'
 
+    def get_object(self):
+        product = get_product(pk=self.kwargs[self.lookup_field])
+        if product is None:
+            raise NotFound()
+        return product
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(request, self.get_object())
+
+    def conditional_response(self, request, product):
+        etag = product_etag(product, request.accepted_renderer.format)
+        last_modified = int(product.updated_timestamp.timestamp())
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = Response(self.get_serializer(product).data)
+        response.headers["ETag"] = etag
+        response.headers["Last-Modified"] = http_date(last_modified)
+        return response
+
+
+class AsyncProductDetailView(AsyncAPIViewMixin, ProductDetailView):
+    """ProductDetailView для ASGI: товар выбирается через async ORM"""
+
+    async def get(self, request, *args, **kwargs):
+        product = await aget_product(pk=self.kwargs[self.lookup_field])
+        if product is None:
+            raise NotFound()
+        return self.conditional_response(request, product)
+
 
 class CartListView(generics.ListAPIView):
     serializer_class = CartSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Cart.objects.filter(user=self.request.user).select_related('product')
+        return DatabaseCartStore(self.request.user).queryset().select_related('product')
 
     def get_serializer_class(self):
         return CartSerializer
 
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
+        serializer = ValuesSerializer(self.get_serializer())
+        items = serializer.serialize(serializer.get_queryset(self.get_queryset()))
 
-        # Используем методы из CartQueryset
-        total_quantity = queryset.total_quantity()
-        total_amount = queryset.total_price()
+        # Итоги по уже выбранным строкам - те же значения, что и у CartQueryset.totals(), без второго запроса
+        totals = cart_totals((item['quantity'], item['total_price']) for item in items)
 
         # Формируем ответ вручную
         response_data = {
-            'items': serializer.data,
-            'total_quantity': total_quantity,
-            'total_amount': total_amount
+            'items': items,
+            **totals,
         }
 
         return Response(response_data)
 
 
+class CartOpsView(APIView):
+    """Несколько изменений корзины одним запросом и в одной транзакции:
+    {"ops": [{"op": "add", "product_id": 1, "quantity": 2}, {"op": "remove", "product_id": 3}]}.
+    Работает и для пользователей (токен или сессия), и для анонимной корзины сессии"""
+
+    def post(self, request, *args, **kwargs):
+        serializer = CartOpsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        store = get_cart_store(request)
+        store.apply_ops(serializer.validated_data["ops"])
+        return Response(store.totals())
+
+
 class OrdersListView(generics.ListAPIView):
     serializer_class = OrderListSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        queryset = Order.objects.filter(user=self.request.user).order_by('-created_timestamp')  # Сортировка по дате
+        queryset = (Order.objects.filter(user=self.request.user).with_totals()
+                    .order_by('-created_timestamp'))  # Сортировка по дате
         limit = self.request.query_params.get('limit')
         if limit:
             try:
@@ -98,5 +392,5 @@ class OrderDetailView(generics.RetrieveAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user).prefetch_related('orderitem_set__product')
+        return Order.objects.filter(user=self.request.user).with_totals().prefetch_related('orderitem_set__product')
 
@@ -6,7 +6,7 @@ from telebot.types import ReplyKeyboardMarkup, KeyboardButton
 from bot.bot_utils import (
     save_token, get_token, delete_token, create_main_keyboard,
     create_pagination_keyboard, create_products_keyboard, create_profile_keyboard,
-    get_products, get_orders, BASE_URL, BASE_DIR, CATEGORIES
+    get_products, get_cursor, get_orders, get_categories, api_get, BASE_URL, BASE_DIR
 )
 import logging
 from urllib.parse import urlparse
@@ -43,7 +43,7 @@ def show_categories(message):
     chat_id = message.chat.id
     ensure_user_state(chat_id)
     markup = ReplyKeyboardMarkup(resize_keyboard=True, row_width=2)
-    buttons = [KeyboardButton(cat['name']) for cat in CATEGORIES]
+    buttons = [KeyboardButton(cat['name']) for cat in get_categories()]
     markup.add(*buttons)
     markup.add(KeyboardButton('Главное меню'))
     bot_message = bot.send_message(chat_id, "Выберите категорию:", reply_markup=markup)
@@ -52,14 +52,22 @@ def show_categories(message):
 
 
 def show_products(chat_id, category_slug, page=1):
-    user_states[chat_id] = {'category_slug': category_slug, 'page': page, 'last_message_ids': [], 'last_products': []}
+    # Курсоры уже открытых страниц категории, чтобы листать без OFFSET
+    state = user_states.get(chat_id, {})
+    cursors = state.get('cursors', {}) if state.get('category_slug') == category_slug else {}
+    user_states[chat_id] = {'category_slug': category_slug, 'page': page, 'last_message_ids': [], 'last_products': [],
+                            'cursors': cursors}
 
-    data = get_products(category_slug, page)
+    data = get_products(category_slug, page, cursors.get(page), telegram_id=chat_id)
     if not data:
         bot.send_message(chat_id, "❌ Ошибка загрузки товаров. Попробуйте позже.")
         return
 
     products = data['results']
+    if get_cursor(data['next']):
+        cursors[page + 1] = get_cursor(data['next'])
+    if get_cursor(data['previous']):
+        cursors[page - 1] = get_cursor(data['previous'])
 
     if not products:
         message = bot.send_message(chat_id, "Товары не найдены.")
@@ -80,14 +88,12 @@ def show_products(chat_id, category_slug, page=1):
 
 def show_product_details(chat_id, pk):
     try:
-        response = requests.get(f"{BASE_URL}/api/v1/products/{pk}/")
-        response.raise_for_status()
+        product = api_get(f"/api/v1/products/{pk}/", telegram_id=chat_id)
     except Exception as e:
         bot.send_message(chat_id, "❌ Ошибка загрузки данных товара. Попробуйте позже.")
         logging.error(f"Failed to fetch product {pk}: {e}")
         return
 
-    product = response.json()
     sell_price = product['sell_price'] if float(product['discount']) > 0.0 else product['price']
     caption = f"{product['name']}\nЦена: {sell_price} $\nОписание: {product['description']}"
 
@@ -170,10 +176,7 @@ def show_profile(message):
         return
 
     try:
-        headers = {'Authorization': f'Token {token}'}
-        response = requests.get(f"{BASE_URL}/auth/users/me/", headers=headers)
-        response.raise_for_status()
-        user_data = response.json()
+        user_data = api_get("/auth/users/me/", token)
         profile_text = (
             f"👤 Профиль пользователя:\n"
             f"━━━━━━━━━━━━━━━━━━━\n"
@@ -200,10 +203,7 @@ def show_cart(message):
         return
 
     try:
-        headers = {'Authorization': f'Token {token}'}
-        response = requests.get(f"{BASE_URL}/api/v1/cart/", headers=headers)
-        response.raise_for_status()
-        cart_data = response.json()
+        cart_data = api_get("/api/v1/cart/", token)
         items = cart_data.get('items', [])
         total_quantity = cart_data.get('total_quantity', 0)
         total_amount = cart_data.get('total_amount', 0)
@@ -278,10 +278,7 @@ def show_order_details(message):
 
     order_id = message.text.split("Заказ №")[1]
     try:
-        headers = {'Authorization': f'Token {token}'}
-        response = requests.get(f"{BASE_URL}/api/v1/orders/{order_id}/", headers=headers)
-        response.raise_for_status()
-        order = response.json()
+        order = api_get(f"/api/v1/orders/{order_id}/", token)
         date = datetime.fromisoformat(order['created_timestamp'].replace('Z', '+00:00')).strftime('%d.%m.%Y %H:%M')
         message_text = (
             f"📦 Детали заказа №{order['id']}:\n"
@@ -353,8 +350,8 @@ def handle_text(message):
     elif message.text == "Главное меню":
         keyboard = create_main_keyboard(chat_id)
         bot.send_message(chat_id, "🏠 Вы вернулись в главное меню.", reply_markup=keyboard)
-    elif message.text in [cat['name'] for cat in CATEGORIES]:
-        category = next((cat for cat in CATEGORIES if cat['name'] == message.text), None)
+    elif any(cat['name'] == message.text for cat in get_categories()):
+        category = next((cat for cat in get_categories() if cat['name'] == message.text), None)
         if category:
             show_products(chat_id, category['slug'], 1)
             logging.info(f"User {chat_id} selected category: {category['name']}")
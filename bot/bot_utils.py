@@ -1,14 +1,19 @@
 import os
 from pathlib import Path
 from cachetools import TTLCache, cached
+from cachetools.keys import hashkey
+import msgpack
 from telebot.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
 import requests
 import logging
+from urllib.parse import parse_qs, urlparse
 from dotenv import load_dotenv
 # Настройка Django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'eshop.settings')
 import django
 django.setup()
+from django.conf import settings
+from goods.cache import get_category_list
 from users.models import TelegramUser
 
 
@@ -25,14 +30,12 @@ BASE_URL = os.getenv('BASE_URL')
 products_cache = TTLCache(maxsize=100, ttl=300)
 orders_cache = TTLCache(maxsize=100, ttl=100)
 
-CATEGORIES = [
-    {'name': 'Все товары', 'slug': 'all'},
-    {'name': 'Кухня', 'slug': 'kuhnya'},
-    {'name': 'Спальня', 'slug': 'spalnya'},
-    {'name': 'Гостиная', 'slug': 'gostinnaya'},
-    {'name': 'Офис', 'slug': 'ofis'},
-    {'name': 'Декор', 'slug': 'dekor'},
-]
+PRODUCTS_PAGE_SIZE = 10
+
+
+def get_categories():
+    # Категории из общего кэша каталога - тот же список, что и на сайте
+    return [{'name': category.name, 'slug': category.slug} for category in get_category_list()]
 
 
 def save_token(telegram_id, token):
@@ -89,7 +92,8 @@ def create_products_keyboard(products, page):
     message_text = f"Товары в категории (страница {page}):\n\n"
     product_buttons = []
     for product in products:
-        message_text += f"{product['name']}\nЦена: {product['sell_price']} $\nОписание: {product['description'][:50]}...\n\n"
+        message_text += (f"{product['name']}\nЦена: {product['sell_price']} $\n"
+                         f"Описание: {product['description'] or ''}\n\n")
         product_buttons.append(KeyboardButton(f"Выбрать: {product['name']}"))
 
     choice_markup = ReplyKeyboardMarkup(resize_keyboard=True, row_width=1)
@@ -109,25 +113,55 @@ def create_profile_keyboard():
     return markup
 
 
-@cached(products_cache)
-def get_products(category_slug, page):
+def products_cache_key(category_slug, page, cursor=None, telegram_id=None):
+    # telegram_id не входит в ключ кэша: страницы каталога одинаковы для всех пользователей
+    return hashkey(category_slug, page, cursor)
+
+
+@cached(products_cache, key=products_cache_key)
+def get_products(category_slug, page, cursor=None, telegram_id=None):
+    # Первая страница и страницы с известным курсором запрашиваются в режиме курсорной пагинации
+    # Только поля, которые показываются в списке, и уже обрезанное на сервере описание
+    params = {'category_slug': category_slug, 'page_size': PRODUCTS_PAGE_SIZE,
+              'fields': 'pk,name,sell_price,description', 'description_length': 50}
+    if cursor:
+        params['cursor'] = cursor
+    elif page == 1:
+        params['pagination'] = 'cursor'
+    else:
+        params['page'] = page
+
     try:
-        response = requests.get(f"{BASE_URL}/api/v1/products/", params={'category_slug': category_slug, 'page': page})
-        response.raise_for_status()
-        return response.json()
+        return api_get("/api/v1/products/", telegram_id=telegram_id, params=params)
     except Exception as e:
         logging.error(f"Failed to fetch products for category {category_slug}, page {page}: {e}")
         return None
 
 
+def api_get(path, token=None, telegram_id=None, **kwargs):
+    # Ответы API запрашиваются в MessagePack: те же данные, что и в JSON, но компактнее и быстрее разбираются
+    headers = {'Accept': 'application/msgpack'}
+    if token:
+        headers['Authorization'] = f'Token {token}'
+    # Лимиты запросов API считаются по пользователю Telegram, а не по общему IP бота
+    if telegram_id and settings.BOT_API_KEY:
+        headers['X-Bot-Key'] = settings.BOT_API_KEY
+        headers['X-Telegram-Id'] = str(telegram_id)
+    response = requests.get(f"{BASE_URL}{path}", headers=headers, **kwargs)
+    response.raise_for_status()
+    return msgpack.unpackb(response.content)
+
+
+def get_cursor(url):
+    if not url:
+        return None
+    return parse_qs(urlparse(url).query).get('cursor', [None])[0]
+
+
 @cached(orders_cache)
 def get_orders(token):
     try:
-        headers = {'Authorization': f'Token {token}'}
-        params = {'limit': 5}
-        response = requests.get(f"{BASE_URL}/api/v1/orders/", headers=headers, params=params)
-        response.raise_for_status()
-        return response.json()
+        return api_get("/api/v1/orders/", token, params={'limit': 5})
     except Exception as e:
         logging.error(f"Failed to fetch orders: {e}")
         return None
\ No newline at end of file
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from carts.models import Cart
+from carts.storage import mark_carts_changed
 
 
 class CartTabAdmin(admin.TabularInline):
@@ -14,3 +15,19 @@ class CartTabAdmin(admin.TabularInline):
 class CartAdmin(admin.ModelAdmin):
     list_display = ["user", "product", "quantity", "created_timestamp"]
     list_filter = ["created_timestamp", "user", "product"]
+
+    # Админка меняет строки в обход хранилищ корзины - итоги и версии корзин сбрасываются здесь
+    def save_model(self, request, obj, form, change):
+        # Строку могли перенести в другую корзину - сбрасывается и прежняя
+        previous = list(Cart.objects.filter(pk=obj.pk)) if change else []
+        super().save_model(request, obj, form, change)
+        mark_carts_changed([obj, *previous])
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        mark_carts_changed([obj])
+
+    def delete_queryset(self, request, queryset):
+        carts = list(queryset.only("user_id", "session_key"))
+        super().delete_queryset(request, queryset)
+        mark_carts_changed(carts)
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:34
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_rows(apps, schema_editor):
+    """Повторные строки одного товара у владельца сливаются в первую - иначе ограничения не создать"""
+    Cart = apps.get_model("carts", "Cart")
+    for owner in ("user", "session_key"):
+        duplicates = (Cart.objects.filter(**{f"{owner}__isnull": False})
+                      .values(owner, "product")
+                      .annotate(rows=Count("id"), first_id=Min("id"), total=Sum("quantity"))
+                      .filter(rows__gt=1))
+        for row in duplicates:
+            Cart.objects.filter(pk=row["first_id"]).update(quantity=min(row["total"], 32767))
+            Cart.objects.filter(**{owner: row[owner], "product": row["product"]}).exclude(pk=row["first_id"]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carts', '0002_alter_cart_options'),
+        ('goods', '0010_products_updated_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_rows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cart',
+            constraint=models.UniqueConstraint(fields=('user', 'product'), name='cart_user_product_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='cart',
+            constraint=models.UniqueConstraint(fields=('session_key', 'product'), name='cart_session_product_unique'),
+        ),
+    ]
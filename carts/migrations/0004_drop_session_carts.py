@@ -0,0 +1,24 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:10
+
+from django.db import migrations
+
+
+def delete_session_carts(apps, schema_editor):
+    """Анонимные корзины теперь в кэше - прежние строки по ключу сессии больше никто не читает"""
+    Cart = apps.get_model("carts", "Cart")
+    Cart.objects.filter(user__isnull=True).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carts', '0003_cart_unique_products'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_session_carts, migrations.RunPython.noop),
+        migrations.RemoveConstraint(
+            model_name='cart',
+            name='cart_session_product_unique',
+        ),
+    ]
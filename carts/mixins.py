@@ -1,32 +1,39 @@
+from django.core.exceptions import BadRequest
 from django.template.loader import render_to_string
 from django.urls import reverse
+from django.utils.formats import localize
 
-from carts.models import Cart
-from carts.utils import get_user_carts
+from carts.storage import get_cart_store
 
 
 class CartMixin:
-    def get_cart(self, request, product=None, cart_id=None):
-        if request.user.is_authenticated:
-            query_kwargs = {"user": request.user}
-        else:
-            query_kwargs = {"session_key": request.session.session_key}
+    def get_id_param(self, request, name):
+        value = request.POST.get(name, "")
+        if not value.isdecimal():
+            raise BadRequest()
+        return int(value)
 
-        if product:
-            query_kwargs["product"] = product
-        if cart_id:
-            query_kwargs["id"] = cart_id
-
-        return Cart.objects.filter(**query_kwargs).first()
-
-    def render_cart(self, request):
-        user_cart = get_user_carts(request)
-
-        context = {"carts": user_cart}
+    def render_cart(self, request, store=None):
+        context = {"carts": store or get_cart_store(request)}
 
         # Если текущая страница - оформление заказа, отправляется флаг
         referer = request.META.get('HTTP_REFERER')
-        if reverse('orders:create_order') in referer:
+        if referer and reverse('orders:create_order') in referer:
             context["order"] = True
 
-        return render_to_string("carts/includes/included_cart.html", context, request=request)
\ No newline at end of file
+        return render_to_string("carts/includes/included_cart.html", context, request=request)
+
+    def cart_delta(self, request, store, line=None, stale=False):
+        """Изменения корзины для частичного обновления страницы: строка, итоги и новая версия корзины.
+        Разметка всей корзины добавляется, только если страница отстала от корзины (stale)"""
+        summary = store.summary()
+        data = {
+            "version": str(store.version()),
+            "total_quantity": summary["total_quantity"],
+            # Суммы в том же формате, что и в шаблоне
+            "total_price": localize(summary["total_amount"]),
+            "line": line and {"cart_id": line.id, "quantity": line.quantity, "price": localize(line.products_price())},
+        }
+        if stale:
+            data["cart_items_html"] = self.render_cart(request, store)
+        return data
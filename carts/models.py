@@ -1,17 +1,40 @@
 from django.db import models
+from django.db.models import F, Sum, Value
+from django.db.models.functions import Coalesce, Round
 
 from goods.models import Products
 from users.models import User
 
 
+def cart_totals(lines):
+    """Итоги корзины за один проход по уже выбранным строкам: пары (количество, сумма строки)"""
+    total_quantity = total_amount = 0
+    for quantity, price in lines:
+        total_quantity += quantity
+        total_amount += price
+    return {"total_quantity": total_quantity, "total_amount": total_amount}
+
+
 class CartQueryset(models.QuerySet):
     def total_price(self):
-        return sum(cart.products_price() for cart in self)
+        return self.totals()["total_amount"]
 
     def total_quantity(self):
-        if self:
-            return sum(cart.quantity for cart in self)
-        return 0
+        return self.totals()["total_quantity"]
+
+    def totals(self):
+        """Количество товаров и сумма корзины. Если строки с товарами уже выбраны - один проход по ним,
+        иначе один агрегирующий запрос. Результат запоминается: шаблоны обращаются к итогам несколько раз"""
+        if getattr(self, "_totals", None) is None:
+            if self._result_cache is not None and all(Cart.product.is_cached(cart) for cart in self._result_cache):
+                self._totals = cart_totals((cart.quantity, cart.products_price()) for cart in self._result_cache)
+            else:
+                self._totals = self.aggregate(
+                    total_quantity=Coalesce(Sum("quantity"), Value(0)),
+                    total_amount=Coalesce(Sum(Round(F("product__sell_price") * F("quantity"), 2)), Value(0),
+                                          output_field=models.DecimalField(max_digits=12, decimal_places=2)),
+                )
+        return self._totals
 
 
 class Cart(models.Model):
@@ -26,11 +49,16 @@ class Cart(models.Model):
         verbose_name = "Корзина"
         verbose_name_plural = "Корзина"
         ordering = ("id",)
+        # Одна строка на товар у пользователя: добавление в корзину - один INSERT ... ON CONFLICT.
+        # Анонимные корзины хранятся в кэше (carts.storage.SessionCartStore), строк в БД у них нет
+        constraints = [
+            models.UniqueConstraint(fields=["user", "product"], name="cart_user_product_unique"),
+        ]
 
     objects = CartQueryset().as_manager()
 
     def products_price(self):
-        return round(self.product.sell_price() * self.quantity, 2)
+        return round(self.product.sell_price * self.quantity, 2)
 
     def __str__(self):
         if self.user:
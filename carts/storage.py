@@ -0,0 +1,357 @@
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+
+from carts.models import Cart, cart_totals
+from carts.utils import MAX_CART_QUANTITY, apply_cart_ops, fold_cart_ops
+from goods.cache import bump_version, get_catalog_version, get_products_by_pk, get_version
+from goods.models import Products
+
+# Итоги корзины для шапки страниц хранятся, пока не изменятся корзина или каталог, но не дольше суток;
+# версия корзины - тоже сутки: после этого страница, открытая раньше, один раз получит корзину целиком
+CART_SUMMARY_TIMEOUT = 60 * 60 * 24
+CART_VERSION_TIMEOUT = 60 * 60 * 24
+EMPTY_CART_SUMMARY = {"total_quantity": 0, "total_amount": 0}
+# Сколько живет блокировка анонимной корзины, если процесс, взявший ее, упал
+CART_LOCK_TIMEOUT = 5
+
+
+def cart_cache():
+    return caches[settings.CART_CACHE_ALIAS]
+
+
+def cart_owner_key(user_id=None, session_key=None):
+    """Владелец корзины для ключей кэша или None - корзины нет"""
+    if user_id:
+        return f"user:{user_id}"
+    if session_key:
+        return f"session:{session_key}"
+    return None
+
+
+def mark_owner_changed(owner_key):
+    """Сбрасывает итоги корзины и меняет ее версию - после фиксации транзакции (при оформлении заказа корзина
+    очищается внутри нее): иначе параллельный запрос мог бы снова закэшировать итоги по еще не измененным строкам"""
+    def mark():
+        cart_cache().delete(f"cart:summary:{owner_key}")
+        bump_version(f"cart:version:{owner_key}", cart_cache(), CART_VERSION_TIMEOUT)
+
+    if owner_key is not None:
+        transaction.on_commit(mark)
+
+
+@contextmanager
+def cart_lock(owner_key):
+    """Блокировка корзины в кэше carts на время чтения, изменения и записи. cache.add() атомарен и в Redis,
+    и в LocMemCache. Блокировку упавшего процесса ждем не дольше CART_LOCK_TIMEOUT - к этому времени она истекает"""
+    key = f"cart:lock:{owner_key}"
+    deadline = time.monotonic() + CART_LOCK_TIMEOUT
+    while not cart_cache().add(key, 1, CART_LOCK_TIMEOUT) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    try:
+        yield
+    finally:
+        cart_cache().delete(key)
+
+
+def mark_carts_changed(carts):
+    """mark_owner_changed() для корзин, строки которых изменены в обход хранилищ (в админке) -
+    один раз на владельца"""
+    for owner_key in {cart_owner_key(cart.user_id, cart.session_key) for cart in carts}:
+        mark_owner_changed(owner_key)
+
+
+class BaseCartStore:
+    """Корзина текущего посетителя. Шаблоны работают с хранилищем как с выборкой корзины:
+    перебирают строки (экземпляры Cart с товаром), проверяют на пустоту, вызывают total_quantity и total_price.
+    Строка корзины указывается по cart_id - это id из items()"""
+
+    def items(self):
+        raise NotImplementedError
+
+    def quantities(self):
+        """Пары (product_id, quantity) - без загрузки товаров"""
+        raise NotImplementedError
+
+    def add(self, product_id, quantity=1):
+        raise NotImplementedError
+
+    def change(self, cart_id, quantity):
+        """Устанавливает количество в строке и возвращает ее (Cart с товаром); None, если строки нет"""
+        raise NotImplementedError
+
+    def remove(self, cart_id):
+        """Удаляет строку и возвращает удаленное количество (0, если строки нет)"""
+        raise NotImplementedError
+
+    def apply_ops(self, ops):
+        """Операции {"op", "product_id", "quantity"} по порядку - см. carts.utils.apply_cart_ops"""
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def totals(self):
+        raise NotImplementedError
+
+    def owner_key(self):
+        """См. cart_owner_key()"""
+        raise NotImplementedError
+
+    def summary(self):
+        """Итоги корзины для шапки страниц - из кэша, без строк корзины и товаров, пока корзина не менялась.
+        Ключ один на владельца; сумма зависит от цен товаров, поэтому при смене версии каталога итоги
+        пересчитываются"""
+        owner_key = self.owner_key()
+        if owner_key is None:
+            return EMPTY_CART_SUMMARY
+        key = f"cart:summary:{owner_key}"
+        catalog_version = get_catalog_version()
+        cached = cart_cache().get(key)
+        if cached is not None and cached["catalog_version"] == catalog_version:
+            return cached["totals"]
+        totals = self.totals()
+        cart_cache().set(key, {"catalog_version": catalog_version, "totals": totals}, CART_SUMMARY_TIMEOUT)
+        return totals
+
+    def version(self):
+        """Версия корзины: меняется при каждом изменении. По ней страница с корзиной узнает,
+        что корзину меняли в обход нее (в другой вкладке) и частичного обновления недостаточно"""
+        owner_key = self.owner_key()
+        if owner_key is None:
+            return None
+        return get_version(f"cart:version:{owner_key}", cart_cache(), CART_VERSION_TIMEOUT)
+
+    def mark_changed(self):
+        mark_owner_changed(self.owner_key())
+
+    def total_quantity(self):
+        return self.totals()["total_quantity"]
+
+    def total_price(self):
+        return self.totals()["total_amount"]
+
+    def __iter__(self):
+        return iter(self.items())
+
+    def __bool__(self):
+        return bool(self.items())
+
+
+class DatabaseCartStore(BaseCartStore):
+    """Корзина пользователя - строки Cart в БД"""
+
+    def __init__(self, user):
+        self.user = user
+
+    @property
+    def owner(self):
+        """Поле строк корзины, по которому они принадлежат владельцу, и его значение"""
+        return {"user_id": self.user.pk}
+
+    def owner_key(self):
+        return cart_owner_key(user_id=self.user.pk)
+
+    def queryset(self):
+        return Cart.objects.filter(**self.owner)
+
+    def items(self):
+        if not hasattr(self, "_items"):
+            self._items = self.queryset().select_related("product")
+        return self._items
+
+    def quantities(self):
+        return list(self.queryset().values_list("product_id", "quantity"))
+
+    def add(self, product_id, quantity=1):
+        # Один запрос без гонок: одновременные добавления не теряют количество и не создают повторных строк
+        # (ограничение cart_user_product_unique)
+        (column, value), = self.owner.items()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {Cart._meta.db_table} ({column}, product_id, quantity, created_timestamp)
+                VALUES (%s, %s, %s, NOW())
+                ON CONFLICT ({column}, product_id)
+                DO UPDATE SET quantity = LEAST({Cart._meta.db_table}.quantity + EXCLUDED.quantity, %s)
+                """,
+                [value, product_id, min(quantity, MAX_CART_QUANTITY), MAX_CART_QUANTITY],
+            )
+        self.mark_changed()
+
+    def change(self, cart_id, quantity):
+        # Условный UPDATE только строки этого владельца, без предварительного SELECT;
+        # товар для строки - из кэша каталога
+        (column, value), = self.owner.items()
+        quantity = min(quantity, MAX_CART_QUANTITY)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {Cart._meta.db_table} SET quantity = %s WHERE id = %s AND {column} = %s RETURNING product_id",
+                [quantity, cart_id, value],
+            )
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        self.mark_changed()
+        product_id = row[0]
+        return Cart(id=cart_id, product=get_products_by_pk([product_id])[product_id], quantity=quantity)
+
+    def remove(self, cart_id):
+        (column, value), = self.owner.items()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {Cart._meta.db_table} WHERE id = %s AND {column} = %s RETURNING quantity",
+                [cart_id, value],
+            )
+            row = cursor.fetchone()
+        if row is None:
+            return 0
+        self.mark_changed()
+        return row[0]
+
+    def apply_ops(self, ops):
+        with transaction.atomic():
+            apply_cart_ops(self.owner, ops)
+        self.mark_changed()
+
+    def clear(self):
+        self.queryset().delete()
+        self.mark_changed()
+
+    def totals(self):
+        return self.items().totals()
+
+
+class SessionCartStore(BaseCartStore):
+    """Анонимная корзина в кэше carts: {product_id: quantity} по ключу сессии, в БД не пишется ничего.
+    Живет столько же, сколько сессия; id строки корзины - id товара. Сессия создается только при первом
+    добавлении товара. Корзина меняется под cart_lock(): одновременные добавления не теряют количество"""
+
+    def __init__(self, request):
+        self.request = request
+
+    def owner_key(self):
+        # Без сессии корзины точно нет - в кэш не обращаемся
+        return cart_owner_key(session_key=self.request.session.session_key)
+
+    def load(self):
+        if not hasattr(self, "_data"):
+            owner_key = self.owner_key()
+            self._data = (cart_cache().get(f"cart:{owner_key}") if owner_key else None) or {}
+        return self._data
+
+    def update(self, change):
+        """Перечитывает корзину под блокировкой, меняет ее на месте функцией change(data) и сохраняет,
+        если change вернула истинное значение (корзина изменилась). Возвращает результат change"""
+        if not self.request.session.session_key:
+            self.request.session.create()
+        owner_key = self.owner_key()
+        key = f"cart:{owner_key}"
+        with cart_lock(owner_key):
+            data = cart_cache().get(key) or {}
+            result = change(data)
+            if result:
+                if data:
+                    cart_cache().set(key, data, settings.SESSION_COOKIE_AGE)
+                else:
+                    cart_cache().delete(key)
+        self._data = data
+        self.__dict__.pop("_items", None)
+        if result:
+            self.mark_changed()
+        return result
+
+    def items(self):
+        if not hasattr(self, "_items"):
+            data = self.load()
+            products = get_products_by_pk(list(data))
+            # Строки удаленных из каталога товаров не показываются
+            self._items = [Cart(id=product_id, product=products[product_id], quantity=quantity)
+                           for product_id, quantity in data.items() if product_id in products]
+        return self._items
+
+    def quantities(self):
+        return list(self.load().items())
+
+    def add(self, product_id, quantity=1):
+        def add(data):
+            data[product_id] = min(data.get(product_id, 0) + quantity, MAX_CART_QUANTITY)
+            return True
+
+        self.update(add)
+
+    def change(self, cart_id, quantity):
+        quantity = min(quantity, MAX_CART_QUANTITY)
+
+        def change(data):
+            if cart_id not in data:
+                return False
+            data[cart_id] = quantity
+            return True
+
+        if not self.request.session.session_key or not self.update(change):
+            return None
+        product = get_products_by_pk([cart_id]).get(cart_id)
+        return product and Cart(id=cart_id, product=product, quantity=quantity)
+
+    def remove(self, cart_id):
+        if not self.request.session.session_key:
+            return 0
+        return self.update(lambda data: data.pop(cart_id, 0))
+
+    def apply_ops(self, ops):
+        def apply(data):
+            quantities = fold_cart_ops(data, ops)
+            data.clear()
+            data.update((product_id, quantity) for product_id, quantity in quantities.items() if quantity)
+            return True
+
+        self.update(apply)
+
+    def clear(self):
+        if self.request.session.session_key:
+            self.update(lambda data: data.clear() or True)
+
+    def totals(self):
+        return cart_totals((cart.quantity, cart.products_price()) for cart in self.items())
+
+
+def get_cart_store(request):
+    if request.user.is_authenticated:
+        return DatabaseCartStore(request.user)
+    return SessionCartStore(request)
+
+
+def merge_session_cart(request, user):
+    """Переносит анонимную корзину в корзину пользователя одним запросом, количество одинаковых товаров
+    складывается. Корзина сессии удаляется из кэша только после этого запроса и под ее блокировкой: добавление
+    в анонимную корзину параллельно со входом не теряется. Вызывать до auth.login() - он меняет ключ сессии"""
+    owner_key = SessionCartStore(request).owner_key()
+    if owner_key is None:
+        return
+
+    table = Cart._meta.db_table
+    with cart_lock(owner_key):
+        quantities = cart_cache().get(f"cart:{owner_key}")
+        if not quantities:
+            return
+        with connection.cursor() as cursor:
+            # Товары, удаленные из каталога, пока лежали в анонимной корзине, пропускаются
+            cursor.execute(
+                f"""
+                INSERT INTO {table} (user_id, product_id, quantity, created_timestamp)
+                SELECT %s, moved.product_id, moved.quantity, NOW()
+                FROM unnest(%s::bigint[], %s::integer[]) AS moved (product_id, quantity)
+                WHERE EXISTS (SELECT 1 FROM {Products._meta.db_table} WHERE id = moved.product_id)
+                ON CONFLICT (user_id, product_id)
+                DO UPDATE SET quantity = LEAST({table}.quantity + EXCLUDED.quantity, %s)
+                """,
+                [user.pk, list(quantities), list(quantities.values()), MAX_CART_QUANTITY],
+            )
+        cart_cache().delete(f"cart:{owner_key}")
+
+    mark_owner_changed(owner_key)
+    DatabaseCartStore(user).mark_changed()
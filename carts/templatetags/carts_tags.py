@@ -1,11 +1,10 @@
 from django import template
 
-from carts.models import Cart
-from carts.utils import get_user_carts
+from carts.storage import get_cart_store
 
 register = template.Library()
 
 
 @register.simple_tag()
 def user_carts(request):
-    return get_user_carts(request)
\ No newline at end of file
+    return get_cart_store(request)
\ No newline at end of file
@@ -1,3 +1,216 @@
-from django.test import TestCase
+import threading
+from types import SimpleNamespace
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.formats import localize
+
+from carts.models import Cart
+from carts.storage import DatabaseCartStore, SessionCartStore
+from goods.models import Categories, Products
+from users.models import User
+
+# Свои кэши на время тестов: в общих могут остаться товары и итоги корзин из других баз
+TEST_CACHES = {alias: {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": f"test-{alias}"}
+               for alias in settings.CACHES}
+
+
+def create_catalog():
+    category = Categories.objects.create(name="Диваны", slug="divany")
+    Products.objects.bulk_create([
+        Products(name=f"Диван {i}", slug=f"divan-{i}", price=100 + i, discount=10 if i == 0 else 0, quantity=10,
+                 category=category)
+        for i in range(3)
+    ])
+    return list(Products.objects.order_by("id"))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CartTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = create_catalog()
+        cls.user = User.objects.create_user(username="buyer", password="Pass-12345-x")
+
+    def add(self, product, times=1):
+        for _ in range(times):
+            response = self.client.post(reverse("cart:cart_add"), {"product_id": product.pk}, secure=True)
+            self.assertEqual(response.status_code, 200)
+
+
+class CartTotalsTest(CartTestCase):
+    def test_totals_from_loaded_rows_or_one_aggregate(self):
+        for product in self.products:
+            Cart.objects.create(user=self.user, product=product, quantity=2)
+        expected = {"total_quantity": 6, "total_amount": sum(product.sell_price * 2 for product in self.products)}
+
+        with self.assertNumQueries(1):
+            self.assertEqual(Cart.objects.filter(user=self.user).totals(), expected)
+
+        carts = Cart.objects.filter(user=self.user).select_related("product")
+        list(carts)
+        with self.assertNumQueries(0):
+            self.assertEqual(carts.totals(), expected)
+            self.assertEqual(carts.total_quantity(), 6)
+
+
+class SessionCartTest(CartTestCase):
+    def session_store(self, session_key):
+        return SessionCartStore(SimpleNamespace(session=SessionStore(session_key)))
+
+    def test_session_created_only_on_first_add(self):
+        response = self.client.get(reverse("main:index"), secure=True)
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+
+        self.add(self.products[0], times=2)
+
+        self.assertEqual(self.session_store(self.client.session.session_key).quantities(), [(self.products[0].pk, 2)])
+
+    def test_anonymous_cart_does_not_touch_database(self):
+        self.add(self.products[0])
+
+        with CaptureQueriesContext(connection) as queries:
+            self.add(self.products[0])
+            self.client.get(reverse("main:index"), secure=True)
+
+        self.assertEqual([query["sql"] for query in queries.captured_queries if '"cart"' in query["sql"]], [])
+        self.assertFalse(Cart.objects.exists())
+
+    def test_session_cart_merges_into_user_cart_on_login(self):
+        Cart.objects.create(user=self.user, product=self.products[0], quantity=5)
+        self.add(self.products[0], times=2)
+        self.add(self.products[1])
+        session_key = self.client.session.session_key
+
+        self.client.post(reverse("user:login"), {"username": "buyer", "password": "Pass-12345-x"}, secure=True)
+
+        self.assertEqual(dict(Cart.objects.filter(user=self.user).values_list("product_id", "quantity")),
+                         {self.products[0].pk: 7, self.products[1].pk: 1})
+        self.assertEqual(self.session_store(session_key).quantities(), [])
+
+    def test_non_decimal_id_rejected(self):
+        response = self.client.post(reverse("cart:cart_add"), {"product_id": "²"}, secure=True)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Cart.objects.exists())
+
+
+class HeaderCartTest(CartTestCase):
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def get_header(self, count):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("main:index"), secure=True)
+        self.assertContains(response, f'<span id="goods-in-cart-count">{count}</span>')
+        return [query["sql"] for query in queries.captured_queries if '"cart"' in query["sql"]]
+
+    def test_header_does_not_query_unchanged_cart(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add(self.products[0], times=2)
+
+        self.assertTrue(self.get_header(2))
+        self.assertEqual(self.get_header(2), [])
+
+    def test_summary_invalidated_after_checkout(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add(self.products[0])
+        self.get_header(1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("orders:create_order"), {
+                "first_name": "Иван", "last_name": "Иванов", "phone_number": "9001234567",
+                "requires_delivery": "0", "payment_on_get": "0",
+            }, secure=True)
+        self.assertEqual(response.status_code, 302)
+
+        self.get_header(0)
+
+
+# Версия корзины меняется после фиксации транзакции - в TestCase ответ собирался бы до этого
+@override_settings(CACHES=TEST_CACHES)
+class CartDeltaTest(TransactionTestCase):
+    add = CartTestCase.add
+
+    def setUp(self):
+        self.products = create_catalog()
+        self.user = User.objects.create_user(username="buyer")
+        self.client.force_login(self.user)
+        self.store = DatabaseCartStore(self.user)
+        self.add(self.products[0])
+        self.add(self.products[1])
+        self.line = Cart.objects.get(user=self.user, product=self.products[0])
+
+    def change(self, quantity, **extra):
+        response = self.client.post(reverse("cart:cart_change"),
+                                    {"cart_id": self.line.pk, "quantity": quantity, **extra}, secure=True)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_current_version_returns_delta(self):
+        version = str(self.store.version())
+
+        data = self.change(3, version=version)
+
+        self.assertNotIn("cart_items_html", data)
+        self.assertEqual(data["line"], {"cart_id": self.line.pk, "quantity": 3,
+                                        "price": localize(self.products[0].sell_price * 3)})
+        self.assertEqual(data["total_quantity"], 4)
+        self.assertEqual(data["total_price"], localize(self.products[0].sell_price * 3 + self.products[1].sell_price))
+        self.assertNotEqual(data["version"], version)
+        self.assertEqual(data["version"], str(self.store.version()))
+
+    def test_stale_version_returns_whole_cart(self):
+        version = str(self.store.version())
+        self.add(self.products[2])
+
+        data = self.change(3, version=version)
+
+        self.assertIn(f'data-cart-id="{self.line.pk}"', data["cart_items_html"])
+        self.assertEqual(data["total_quantity"], 5)
+
+    def test_without_version_returns_whole_cart(self):
+        data = self.change(3)
+
+        self.assertIn("cart_items_html", data)
+        self.assertNotIn("version", data)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ConcurrentCartAddTest(TransactionTestCase):
+    threads = 10
+    adds_per_thread = 5
+
+    def run_concurrently(self, add):
+        barrier = threading.Barrier(self.threads)
+
+        def worker():
+            try:
+                barrier.wait()
+                for _ in range(self.adds_per_thread):
+                    add()
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=worker) for _ in range(self.threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+    def test_concurrent_adds_are_not_lost(self):
+        product = create_catalog()[0]
+        user = User.objects.create_user(username="buyer")
+        session = SessionStore()
+        session.create()
+        stores = {"user": DatabaseCartStore(user), "session": SessionCartStore(SimpleNamespace(session=session))}
+
+        for owner, store in stores.items():
+            with self.subTest(owner=owner):
+                self.run_concurrently(lambda: store.add(product.pk))
+
+                self.assertEqual(store.quantities(), [(product.pk, self.threads * self.adds_per_thread)])
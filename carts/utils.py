@@ -1,10 +1,51 @@
 from carts.models import Cart
 
+# Предел PositiveSmallIntegerField
+MAX_CART_QUANTITY = 32767
 
-def get_user_carts(request):
-    if request.user.is_authenticated:
-        return Cart.objects.filter(user=request.user).select_related('product')
 
-    if not request.session.session_key:
-        request.session.create()
-    return Cart.objects.filter(session_key=request.session.session_key).select_related('product')
\ No newline at end of file
+def fold_cart_ops(quantities, ops):
+    """Количества товаров {product_id: quantity} после операций по порядку; 0 - товар удален"""
+    quantities = dict(quantities)
+    for op in ops:
+        product_id = op["product_id"]
+        if op["op"] == "add":
+            quantity = quantities.get(product_id, 0) + op["quantity"]
+        elif op["op"] == "set":
+            quantity = op["quantity"]
+        else:
+            quantity = 0
+        quantities[product_id] = min(quantity, MAX_CART_QUANTITY)
+    return quantities
+
+
+def apply_cart_ops(owner, ops):
+    """Применяет к корзине операции {"op": "add" | "set" | "remove", "product_id", "quantity"} по порядку
+    и сохраняет итог тремя запросами: bulk_create, bulk_update и delete.
+    Вызывать внутри транзакции: строки корзины блокируются до ее конца"""
+    carts = {cart.product_id: cart for cart in
+             Cart.objects.filter(**owner, product_id__in={op["product_id"] for op in ops}).select_for_update()}
+
+    quantities = fold_cart_ops({product_id: cart.quantity for product_id, cart in carts.items()}, ops)
+
+    to_create, to_update, to_delete = [], [], []
+    for product_id, quantity in quantities.items():
+        cart = carts.get(product_id)
+        if cart is None:
+            if quantity:
+                to_create.append(Cart(**owner, product_id=product_id, quantity=quantity))
+        elif not quantity:
+            to_delete.append(cart.pk)
+        elif quantity != cart.quantity:
+            cart.quantity = quantity
+            to_update.append(cart)
+
+    if to_create:
+        # Строка того же товара, добавленная параллельным запросом, получает количество из этих операций,
+        # а не ошибку уникальности
+        Cart.objects.bulk_create(to_create, update_conflicts=True, unique_fields=[*owner, "product"],
+                                 update_fields=["quantity"])
+    if to_update:
+        Cart.objects.bulk_update(to_update, ["quantity"])
+    if to_delete:
+        Cart.objects.filter(pk__in=to_delete).delete()
@@ -1,22 +1,16 @@
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse
 from django.views import View
 from carts.mixins import CartMixin
-from carts.models import Cart
-from goods.models import Products
+from carts.storage import get_cart_store
+from goods.cache import get_product
 
 
 class CartAddView(CartMixin, View):
     def post(self, request):
-        product_id = request.POST.get("product_id")
-        product = Products.objects.get(pk=product_id)
-        cart = self.get_cart(request, product=product)
-        if cart:
-            cart.quantity += 1
-            cart.save()
-        else:
-            Cart.objects.create(user=request.user if request.user.is_authenticated else None,
-                                session_key=request.session.session_key if not request.user.is_authenticated else None,
-                                product=product, quantity=1)
+        product = get_product(pk=self.get_id_param(request, "product_id"))
+        if product is None:
+            raise Http404()
+        get_cart_store(request).add(product.pk)
 
         response_data = {
             "message": "Товар добавлен в корзину!",
@@ -27,31 +21,39 @@ class CartAddView(CartMixin, View):
 
 class CartChangeView(CartMixin, View):
     def post(self, request):
-        cart_id = request.POST.get("cart_id")
-        cart = self.get_cart(request, cart_id=cart_id)
-        cart.quantity = request.POST.get("quantity")
-        cart.save()
+        cart_id = self.get_id_param(request, "cart_id")
+        store = get_cart_store(request)
+        # С версией корзины клиент просит только изменения (см. CartMixin.cart_delta)
+        version = request.POST.get("version")
+        stale = version is not None and version != str(store.version())
+        line = store.change(cart_id, self.get_id_param(request, "quantity"))
 
         response_data = {
             "message": "Количество изменено",
-            "cart_items_html": self.render_cart(request)
         }
+        if version is None:
+            response_data["cart_items_html"] = self.render_cart(request, store)
+        else:
+            response_data.update(self.cart_delta(request, store, line, stale=stale or line is None))
 
         return JsonResponse(response_data)
 
 
 class CartRemoveView(CartMixin, View):
     def post(self, request):
-        cart_id = request.POST.get("cart_id")
-        cart = self.get_cart(request, cart_id=cart_id)
-        quantity = cart.quantity
-        cart.delete()
+        cart_id = self.get_id_param(request, "cart_id")
+        store = get_cart_store(request)
+        version = request.POST.get("version")
+        stale = version is not None and version != str(store.version())
+        quantity = store.remove(cart_id)
 
         response_data = {
             "message": "Товар удален",
-            "cart_items_html": self.render_cart(request),
             "quantity_deleted": quantity
         }
+        if version is None:
+            response_data["cart_items_html"] = self.render_cart(request, store)
+        else:
+            response_data.update(self.cart_delta(request, store, stale=stale or not quantity))
 
         return JsonResponse(response_data)
-
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "eshop.settings")
+# Каталог на чтение - async-представления (см. ASYNC_VIEWS в settings.py)
+os.environ.setdefault("ASYNC_VIEWS", "True")
 
 application = get_asgi_application()
@@ -0,0 +1,69 @@
+import brotli
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+from django.utils.regex_helper import _lazy_re_compile
+
+re_accepts_brotli = _lazy_re_compile(r"\bbr\b")
+
+
+def compress_brotli_sequence(sequence, quality):
+    compressor = brotli.Compressor(quality=quality)
+    for chunk in sequence:
+        data = compressor.process(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """Сжатие ответов от min_length байт: brotli, если клиент его принимает, иначе gzip.
+
+    brotli - только для данных API и статики (brotli_content_types) и только если в ответ не попал CSRF-токен.
+    Страницы и ответы с токеном сжимаются gzip из GZipMiddleware: в нем есть защита от BREACH (случайная
+    длина ответа), а у brotli ее нет. Асинхронные потоковые ответы тоже сжимаются только gzip"""
+
+    min_length = 1024
+    brotli_quality = 5
+    brotli_content_types = (
+        "application/json", "application/msgpack", "application/x-ndjson", "text/csv",
+        "text/css", "text/javascript", "application/javascript", "image/svg+xml",
+    )
+
+    def use_brotli(self, request, response):
+        if not re_accepts_brotli.search(request.META.get("HTTP_ACCEPT_ENCODING", "")):
+            return False
+        if response.has_header("Content-Encoding") or (response.streaming and response.is_async):
+            return False
+        content_type = response.get("Content-Type", "").split(";")[0].strip()
+        return content_type in self.brotli_content_types and not self.uses_csrf_token(request)
+
+    @staticmethod
+    def uses_csrf_token(request):
+        # get_token() ставит CSRF_COOKIE_NEEDS_UPDATE, а CsrfViewMiddleware.process_response сбрасывает его
+        # в False еще до этого middleware. Ключ при этом остается - по нему и видно, что токен был в ответе
+        return "CSRF_COOKIE_NEEDS_UPDATE" in request.META
+
+    def process_response(self, request, response):
+        if not response.streaming and len(response.content) < self.min_length:
+            return response
+
+        if not self.use_brotli(request, response):
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        if response.streaming:
+            response.streaming_content = compress_brotli_sequence(response.streaming_content, self.brotli_quality)
+            del response.headers["Content-Length"]
+        else:
+            compressed_content = brotli.compress(response.content, quality=self.brotli_quality)
+            if len(compressed_content) >= len(response.content):
+                return response
+            response.content = compressed_content
+            response.headers["Content-Length"] = str(len(response.content))
+
+        # Как в GZipMiddleware: сжатый ответ - уже не тот же набор байт, ETag становится слабым
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = "br"
+        return response
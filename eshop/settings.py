@@ -53,6 +53,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    # Сжатие ответов (gzip/brotli) - до middleware, которые читают или меняют тело ответа
+    "eshop.middleware.CompressionMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -97,6 +99,36 @@ DATABASES = {
 }
 
 
+# Cache
+# Файловый кэш общий для всех процессов сервера на одной машине
+
+# Лимиты запросов, итоги и версии корзин пишутся почти на каждый запрос - файловому кэшу (каждая запись
+# перебирает все файлы кэша) это не подходит. Для них Redis из REDIS_URL, общий для процессов сервера.
+# Без REDIS_URL - память процесса: годится только для одного процесса (runserver, тесты)
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    FAST_CACHE = {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': REDIS_URL}
+else:
+    FAST_CACHE = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'OPTIONS': {'MAX_ENTRIES': 100000}}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('CACHE_LOCATION', BASE_DIR / 'cache'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+    # Анонимные корзины, итоги и версии всех корзин (carts.storage) - пишутся при каждом изменении корзины.
+    # Анонимные корзины есть только здесь: в Redis для них нужен maxmemory-policy noeviction
+    'carts': {**FAST_CACHE, 'KEY_PREFIX': 'carts'},
+    # Состояние лимитов запросов (api.throttling.CostRateThrottle)
+    'throttle': {**FAST_CACHE, 'KEY_PREFIX': 'throttle'},
+}
+CART_CACHE_ALIAS = 'carts'
+THROTTLE_CACHE_ALIAS = 'throttle'
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -143,12 +175,41 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# Поисковый движок каталога: goods.search.PostgresSearchBackend или goods.search.InMemorySearchBackend.
+# InMemorySearchBackend снимает с БД только сам поиск: база остается PostgreSQL - модель товара хранит
+# search_vector (GeneratedField), подсказки используют pg_trgm
+GOODS_SEARCH_BACKEND = os.getenv('GOODS_SEARCH_BACKEND', 'goods.search.PostgresSearchBackend')
+
+# Общий ключ сайта и Telegram-бота: с ним лимиты запросов к API считаются по пользователю Telegram, а не по IP бота
+BOT_API_KEY = os.getenv('BOT_API_KEY', '')
+
+# Async-представления каталога (список и карточка товара в API, каталог и страница товара).
+# Включаются в eshop/asgi.py; под WSGI остаются синхронные
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'False') == 'True'
+
 AUTH_USER_MODEL = "users.User"
 LOGIN_URL = "/user/login/"
 LOGIN_REDIRECT_URL = "/"
 
 
 REST_FRAMEWORK = {
+    # Формат выбирается по Accept: JSON (orjson) по умолчанию, MessagePack - application/msgpack
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.ORJSONRenderer',
+        'api.renderers.MessagePackRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+
+    # Лимиты каталога в токенах (см. api.throttling.CostRateThrottle): простой список стоит 1, поиск - 5
+    'DEFAULT_THROTTLE_RATES': {
+        'catalog_anon': os.getenv('CATALOG_THROTTLE_ANON', '120/min'),
+        'catalog_user': os.getenv('CATALOG_THROTTLE_USER', '600/min'),
+    },
+
+    # Сколько прокси перед сервером добавляют X-Forwarded-For. 0 - IP клиента берется из REMOTE_ADDR, заголовок
+    # не учитывается: иначе клиент подставил бы в него любой адрес и обходил лимиты. За одним прокси
+    # (nginx, ngrok) - 1
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', '0')),
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.TokenAuthentication',
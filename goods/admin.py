@@ -11,7 +11,7 @@ class CategoriesAdmin(admin.ModelAdmin):
 @admin.register(Products)
 class ProductsAdmin(admin.ModelAdmin):
     prepopulated_fields = {"slug": ("name", )}
-    list_display = ["name", "quantity", "price", "discount"]
+    list_display = ["name", "quantity", "price", "discount", "sell_price"]
     list_editable = ["discount"]
     search_fields = ["name", "description"]
     list_filter = ["discount", "quantity", "category"]
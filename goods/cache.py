@@ -0,0 +1,143 @@
+import time
+
+from django.core.cache import cache
+
+from goods.models import Categories, Products
+
+CATALOG_VERSION_KEY = "catalog:version"
+PRODUCTS_VERSION_KEY = "catalog:products:version"
+CATEGORIES_VERSION_KEY = "catalog:categories:version"
+CATEGORIES_CACHE_TIMEOUT = 60 * 60 * 24
+PRODUCT_CACHE_TIMEOUT = 60 * 60
+
+
+def category_version_key(category_id):
+    return f"catalog:category:{category_id}:version"
+
+
+def get_version(key, backend=cache, timeout=None):
+    version = backend.get(key)
+    if version is None:
+        # Начальная версия от времени, а не 1: если ключ вытеснен из кэша или истек,
+        # новая версия не совпадет ни с одной из уже использованных
+        backend.add(key, time.time_ns(), timeout)
+        version = backend.get(key)
+    return version
+
+
+def bump_version(key, backend=cache, timeout=None):
+    try:
+        backend.incr(key)
+    except ValueError:
+        backend.set(key, time.time_ns(), timeout)
+
+
+def get_products_version(category_id=None):
+    """Версия товаров категории (или всего каталога) для ключей кэша"""
+    if category_id is None:
+        return get_version(PRODUCTS_VERSION_KEY)
+    return get_version(category_version_key(category_id))
+
+
+def get_catalog_version():
+    """Версия всего каталога: меняется при любом изменении товара или категории"""
+    return get_version(CATALOG_VERSION_KEY)
+
+
+def invalidate_products(*category_ids):
+    bump_version(CATALOG_VERSION_KEY)
+    bump_version(PRODUCTS_VERSION_KEY)
+    for category_id in set(category_ids):
+        if category_id is not None:
+            bump_version(category_version_key(category_id))
+
+
+def categories_key():
+    return f"catalog:categories:{get_version(CATEGORIES_VERSION_KEY)}"
+
+
+def get_categories():
+    """Все категории и словарь slug -> категория. Ключ кэша содержит версию,
+    которая меняется при сохранении или удалении любой категории"""
+    key = categories_key()
+    categories = cache.get(key)
+    if categories is None:
+        categories = list(Categories.objects.all())
+        cache.set(key, categories, CATEGORIES_CACHE_TIMEOUT)
+    return categories, {category.slug: category for category in categories}
+
+
+async def aget_categories():
+    """get_categories() для async-представлений: при промахе кэша категории выбираются через async ORM.
+    Сам кэш вызывается синхронно - обращения к нему короткие, а его async-методы в Django - это
+    обертки sync_to_async, которые только добавили бы переход в другой поток"""
+    key = categories_key()
+    categories = cache.get(key)
+    if categories is None:
+        categories = [category async for category in Categories.objects.all()]
+        cache.set(key, categories, CATEGORIES_CACHE_TIMEOUT)
+    return categories, {category.slug: category for category in categories}
+
+
+def get_category_list():
+    return get_categories()[0]
+
+
+def get_category_by_slug(slug):
+    return get_categories()[1].get(slug)
+
+
+def invalidate_categories():
+    bump_version(CATALOG_VERSION_KEY)
+    bump_version(CATEGORIES_VERSION_KEY)
+
+
+def product_key(field, value):
+    return f"catalog:product:{field}:{value}"
+
+
+def cache_products(products):
+    cache.set_many({product_key(field, getattr(product, field)): product
+                    for product in products for field in ("slug", "pk")}, PRODUCT_CACHE_TIMEOUT)
+
+
+def get_product(**lookup):
+    """Товар по slug= или pk= из общего кэша; None, если товара нет"""
+    (field, value), = lookup.items()
+    product = cache.get(product_key(field, value))
+    if product is None:
+        # search_vector в кэш не кладем: на странице и в API он не нужен
+        product = Products.objects.defer("search_vector").filter(**lookup).first()
+        if product is None:
+            return None
+        cache_products([product])
+    return product
+
+
+async def aget_product(**lookup):
+    """get_product() для async-представлений: при промахе кэша товар выбирается через async ORM"""
+    (field, value), = lookup.items()
+    product = cache.get(product_key(field, value))
+    if product is None:
+        product = await Products.objects.defer("search_vector").filter(**lookup).afirst()
+        if product is None:
+            return None
+        cache_products([product])
+    return product
+
+
+def get_products_by_pk(pks):
+    """Словарь pk -> товар: что есть в кэше - из кэша, остальное одним запросом. Отсутствующих pk в словаре нет"""
+    cached = cache.get_many([product_key("pk", pk) for pk in pks])
+    products = {product.pk: product for product in cached.values()}
+
+    missing = [pk for pk in pks if pk not in products]
+    if missing:
+        found = list(Products.objects.defer("search_vector").filter(pk__in=missing))
+        cache_products(found)
+        products.update((product.pk, product) for product in found)
+    return products
+
+
+def invalidate_product(pk, *slugs):
+    cache.delete_many([product_key("pk", pk), *(product_key("slug", slug) for slug in slugs if slug)])
@@ -0,0 +1,79 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from goods.models import Categories, Products
+from goods.search import InMemorySearchBackend, PostgresSearchBackend
+
+ADJECTIVES = ["кухонный", "офисный", "мягкий", "деревянный", "угловой", "раскладной", "прикроватный", "чайный",
+              "дизайнерский", "компактный", "массивный", "плетеный", "металлический", "белый", "черный"]
+NOUNS = ["стол", "стул", "диван", "шкаф", "комод", "кресло", "столик", "кровать", "полка", "тумба", "зеркало",
+         "светильник", "пуф", "стеллаж", "табурет"]
+WORDS = ADJECTIVES + NOUNS + ["для", "комнаты", "гостиной", "спальни", "кухни", "офиса", "из", "дуба", "ткани",
+                              "кожи", "стекла", "комплект", "набор", "современный", "классический", "уютный"]
+
+
+class Command(BaseCommand):
+    help = "Сравнивает скорость поиска PostgresSearchBackend и InMemorySearchBackend на сгенерированном каталоге"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=100_000)
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        queries = [" ".join(rng.sample(WORDS, rng.randint(1, 2))) for _ in range(options["queries"])]
+
+        # Каталог создается внутри транзакции и откатывается после замеров
+        with transaction.atomic():
+            self.generate_catalog(rng, options["products"])
+
+            postgres = PostgresSearchBackend()
+            in_memory = InMemorySearchBackend()
+
+            started = time.perf_counter()
+            in_memory.build()
+            build_time = time.perf_counter() - started
+            self.stdout.write(f"In-memory index built in {build_time:.2f} s "
+                              f"for {options['products']} products")
+
+            for name, backend in (("postgres", postgres), ("in-memory", in_memory)):
+                self.report(name, [self.measure(lambda: list(backend.search(query)[:3])) for query in queries])
+            # Отдельно время самого индекса, без выборки товаров из БД
+            self.report("in-memory (rank only)", [self.measure(lambda: in_memory.rank(query)) for query in queries])
+
+            transaction.set_rollback(True)
+
+    def generate_catalog(self, rng, count):
+        category = Categories.objects.create(name="search-benchmark", slug="search-benchmark")
+        batch = []
+        for i in range(count):
+            name = f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i}"
+            description = " ".join(rng.choices(WORDS, k=rng.randint(8, 30)))
+            batch.append(Products(name=name, slug=f"search-benchmark-{i}", description=description,
+                                  price=rng.randint(10, 1000), category=category))
+            if len(batch) == 5000:
+                Products.objects.bulk_create(batch)
+                batch = []
+        Products.objects.bulk_create(batch)
+
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE product")
+
+    def measure(self, run):
+        # Для бэкендов замеряется полный путь q_search: поиск + выборка первой страницы товаров
+        started = time.perf_counter()
+        run()
+        return (time.perf_counter() - started) * 1000
+
+    def report(self, name, timings):
+        timings.sort()
+        self.stdout.write(
+            f"{name:>21}: mean {statistics.mean(timings):7.2f} ms | "
+            f"p50 {timings[len(timings) // 2]:7.2f} ms | "
+            f"p95 {timings[int(len(timings) * 0.95)]:7.2f} ms"
+        )
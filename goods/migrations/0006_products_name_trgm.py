@@ -0,0 +1,22 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:05
+
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("goods", "0005_products_search_vector"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name="products",
+            index=GinIndex(
+                fields=["name"], name="product_name_trgm_idx", opclasses=["gin_trgm_ops"]
+            ),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:05
+
+import django.db.models.expressions
+import django.db.models.functions.math
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goods', '0006_products_name_trgm'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='products',
+            name='sell_price',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.math.Round(django.db.models.expressions.CombinedExpression(models.F('price'), '*', django.db.models.expressions.CombinedExpression(models.Value(1), '-', django.db.models.expressions.CombinedExpression(models.F('discount'), '/', models.Value(100)))), 2), output_field=models.DecimalField(decimal_places=2, max_digits=7), verbose_name='Цена со скидкой'),
+        ),
+        migrations.AddIndex(
+            model_name='products',
+            index=models.Index(fields=['category', 'sell_price'], name='product_category_price_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goods', '0007_products_sell_price'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='products',
+            name='product_category_price_idx',
+        ),
+        migrations.AddIndex(
+            model_name='products',
+            index=models.Index(fields=['category', 'id'], name='product_category_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='products',
+            index=models.Index(fields=['sell_price', 'id'], name='product_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='products',
+            index=models.Index(fields=['category', 'sell_price', 'id'], name='product_category_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='products',
+            index=models.Index(fields=['discount', 'id'], name='product_discount_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='products',
+            index=models.Index(fields=['category', 'discount', 'id'], name='product_category_discount_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goods', '0009_products_updated_timestamp'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='products',
+            index=models.Index(fields=['updated_timestamp', 'id'], name='product_updated_idx'),
+        ),
+    ]
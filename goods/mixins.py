@@ -0,0 +1,91 @@
+from decimal import Decimal, InvalidOperation
+
+from asgiref.sync import sync_to_async
+from django.http import Http404
+
+from goods.cache import aget_categories, get_category_by_slug
+from goods.models import Products
+from goods.search import get_search_backend
+from goods.utils import q_search
+
+
+class ProductsFilterMixin:
+    """Общие фильтры каталога для страницы каталога, списка товаров в API и фасетов"""
+
+    # Допустимые сортировки. Каждой соответствуют составные индексы из Products.Meta.indexes:
+    # по самому ключу и с категорией впереди. default - порядок выборки (id или релевантность поиска).
+    # Сортировка по цене - по цене со скидкой, которую видит покупатель
+    ordering_fields = {
+        "default": None,
+        "price": ("sell_price", "id"),
+        "-price": ("-sell_price", "-id"),
+        "-discount": ("-discount", "-id"),
+    }
+
+    def get_category_slug(self):
+        return self.request.GET.get("category_slug")
+
+    def search_products(self):
+        on_sale = self.request.GET.get("on_sale")
+        query = self.request.GET.get("q")
+        min_price = self.get_price_param("min_price")
+        max_price = self.get_price_param("max_price")
+
+        goods = q_search(query) if query else Products.objects.all()
+        if on_sale:
+            goods = goods.filter(discount__gt=0)
+        if min_price is not None:
+            goods = goods.filter(sell_price__gte=min_price)
+        if max_price is not None:
+            goods = goods.filter(sell_price__lte=max_price)
+        return goods
+
+    def get_price_param(self, name):
+        """Некорректная цена игнорируется"""
+        try:
+            value = Decimal(self.request.GET.get(name) or "")
+        except InvalidOperation:
+            return None
+        return value if value.is_finite() else None
+
+    def filter_by_category(self, goods):
+        category_slug = self.get_category_slug()
+
+        if self.request.GET.get("q") or category_slug == "all" or not category_slug:
+            return goods
+
+        # Фильтр по category_id, а не по category__slug: без JOIN работают составные индексы (category, ...)
+        category = self.get_category(category_slug)
+        if category is None:
+            raise Http404()
+        return goods.filter(category_id=category.pk)
+
+    def get_category(self, slug):
+        return get_category_by_slug(slug)
+
+    def get_ordering(self):
+        """Неизвестная сортировка игнорируется"""
+        return self.ordering_fields.get(self.request.GET.get("order_by") or "default")
+
+    def order_products(self, goods):
+        ordering = self.get_ordering()
+
+        if ordering:
+            goods = goods.order_by(*ordering)
+        return goods
+
+
+class AsyncProductsFilterMixin:
+    """Фильтры ProductsFilterMixin в async-представлениях. Категории загружаются заранее через async ORM,
+    а выборка строится в потоке, только если поиск сам обращается к БД (индекс в памяти процесса)"""
+
+    async def aload_categories(self):
+        self.categories = (await aget_categories())[1]
+
+    def get_category(self, slug):
+        return self.categories.get(slug)
+
+    async def abuild_queryset(self, build):
+        if self.request.GET.get("q") and not get_search_backend().lazy:
+            return await sync_to_async(build)()
+        return build()
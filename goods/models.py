@@ -1,4 +1,8 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import Round
 from django.urls import reverse
 
 
@@ -28,12 +32,42 @@ class Products(models.Model):
     discount = models.DecimalField(default=0.00, max_digits=7, decimal_places=2, verbose_name="Скидка в %")
     quantity = models.PositiveIntegerField(default=0, verbose_name="Количество")
     category = models.ForeignKey(to=Categories, on_delete=models.CASCADE, verbose_name="Категория")
+    updated_timestamp = models.DateTimeField(auto_now=True, verbose_name="Дата изменения")
+    # Цена со скидкой считается в БД, чтобы по ней можно было сортировать и фильтровать.
+    # ROUND в PostgreSQL округляет половину копейки вверх, а не к четному, как round() для Decimal
+    # в прежнем методе sell_price(): цены ровно на полкопейки (10.05 со скидкой 50% = 5.025) стали на копейку выше
+    sell_price = models.GeneratedField(
+        expression=Round(F("price") * (1 - F("discount") / 100), 2),
+        output_field=models.DecimalField(max_digits=7, decimal_places=2),
+        db_persist=True,
+        verbose_name="Цена со скидкой",
+    )
+    # Поисковый вектор хранится в БД и пересчитывается самой БД при любом изменении name/description,
+    # включая bulk_create() и update()
+    search_vector = models.GeneratedField(
+        expression=SearchVector("name", weight="A", config="russian")
+        + SearchVector("description", weight="B", config="russian"),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
 
     class Meta:
         db_table = 'product'
         verbose_name = "Продукт"
         verbose_name_plural = "Продукты"
         ordering = ["id"]
+        indexes = [
+            GinIndex(fields=["search_vector"], name="product_search_vector_idx"),
+            GinIndex(fields=["name"], name="product_name_trgm_idx", opclasses=["gin_trgm_ops"]),
+            # Индексы под сортировки каталога (goods.mixins.ProductsFilterMixin.ordering_fields)
+            models.Index(fields=["category", "id"], name="product_category_id_idx"),
+            # Инкрементальная выгрузка каталога (since=) идет по времени изменения
+            models.Index(fields=["updated_timestamp", "id"], name="product_updated_idx"),
+            models.Index(fields=["sell_price", "id"], name="product_price_idx"),
+            models.Index(fields=["category", "sell_price", "id"], name="product_category_price_idx"),
+            models.Index(fields=["discount", "id"], name="product_discount_idx"),
+            models.Index(fields=["category", "discount", "id"], name="product_category_discount_idx"),
+        ]
 
     def __str__(self):
         return f"{self.name}"
@@ -43,8 +77,3 @@ class Products(models.Model):
 
     def display_id(self):
         return f"{self.pk:05}"
-
-    def sell_price(self):
-        if self.discount:
-            return round(self.price * (1 - self.discount / 100), 2)
-        return self.price
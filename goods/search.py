@@ -0,0 +1,242 @@
+import json
+import logging
+import math
+import re
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, FloatField
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast
+from django.utils.module_loading import import_string
+
+from goods.models import Products
+
+logger = logging.getLogger(__name__)
+
+
+class BaseSearchBackend:
+    """Поисковый движок каталога. search() возвращает QuerySet товаров с аннотацией rank,
+    отсортированный по убыванию релевантности."""
+
+    # search() только строит QuerySet и не обращается к БД - его можно вызывать из async-кода
+    lazy = False
+
+    def search(self, query):
+        raise NotImplementedError
+
+    def update(self, product):
+        pass
+
+    def remove(self, pk):
+        pass
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """Полнотекстовый поиск PostgreSQL по сохраненному search_vector"""
+    lazy = True
+
+    def search(self, query):
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+
+        query = SearchQuery(query, config="russian")
+
+        # Фильтр по оператору @@ использует GIN-индекс по search_vector.
+        # ts_rank возвращает real - приводим к double precision, чтобы значение rank
+        # без потери точности возвращалось в курсор пагинации и сравнивалось в WHERE
+        return (Products.objects.filter(search_vector=query)
+                .annotate(rank=Cast(SearchRank(F("search_vector"), query), FloatField()))
+                .order_by("-rank", "id"))
+
+
+TOKEN_RE = re.compile(r"\w+")
+# Окончания, которые отрезаются при токенизации (грубый стемминг для русского языка)
+SUFFIXES = sorted((
+    "ьями", "иями", "ями", "ами", "ьев", "ьям", "ьях", "ого", "его", "ому", "ему", "ыми", "ими", "ых", "их", "ья",
+    "ая", "яя", "ое", "ее", "ые", "ие", "ый", "ий", "ой", "ом", "ем", "ам", "ям", "ах", "ях", "ов", "ев", "ей", "ью",
+    "а", "я", "о", "е", "ы", "и", "у", "ю", "ь", "й",
+), key=len, reverse=True)
+MIN_STEM_LENGTH = 3
+
+
+def tokenize(text):
+    tokens = []
+    for token in TOKEN_RE.findall((text or "").lower().replace("ё", "е")):
+        for suffix in SUFFIXES:
+            if token.endswith(suffix) and len(token) - len(suffix) >= MIN_STEM_LENGTH:
+                token = token[:-len(suffix)]
+                break
+        tokens.append(token)
+    return tokens
+
+
+class SearchIndex:
+    """Инвертированный индекс: term -> {pk: взвешенная частота}, длины документов"""
+
+    def __init__(self, field_weights):
+        self.field_weights = field_weights
+        self.postings = defaultdict(dict)
+        self.doc_terms = {}
+        self.doc_lengths = {}
+        self.total_length = 0
+        self.built_at = time.monotonic()
+
+    def add(self, pk, name, description):
+        frequencies = defaultdict(int)
+        for field, text in (("name", name), ("description", description)):
+            for term in tokenize(text):
+                frequencies[term] += self.field_weights[field]
+
+        for term, frequency in frequencies.items():
+            self.postings[term][pk] = frequency
+        self.doc_terms[pk] = tuple(frequencies)
+        self.doc_lengths[pk] = sum(frequencies.values())
+        self.total_length += self.doc_lengths[pk]
+
+    def remove(self, pk):
+        for term in self.doc_terms.pop(pk, ()):
+            postings = self.postings[term]
+            postings.pop(pk, None)
+            if not postings:
+                del self.postings[term]
+        self.total_length -= self.doc_lengths.pop(pk, 0)
+
+
+class InMemorySearchBackend(BaseSearchBackend):
+    """Инвертированный индекс в памяти процесса с ранжированием BM25.
+
+    Индекс строится при первом поиске, обновляется по сигналам сохранения/удаления товара
+    в этом процессе и раз в max_age секунд перестраивается в фоновом потоке, чтобы подхватить
+    изменения из других процессов и из bulk-операций. Пока идет перестройка, поиск работает
+    по старому индексу; изменения товаров за это время применяются к обоим."""
+
+    k1 = 1.2
+    b = 0.75
+    field_weights = {"name": 3, "description": 1}
+    max_age = 300
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._index = None
+        # Изменения товаров во время фоновой перестройки: (pk, product или None - удален)
+        self._pending = None
+
+    def build(self, products=None):
+        """Строит индекс в текущем потоке и подменяет им старый"""
+        if products is None:
+            products = Products.objects.values_list("pk", "name", "description").iterator(chunk_size=2000)
+
+        index = SearchIndex(self.field_weights)
+        for pk, name, description in products:
+            index.add(pk, name, description)
+
+        with self._lock:
+            for pk, product in self._pending or ():
+                index.remove(pk)
+                if product is not None:
+                    index.add(pk, product.name, product.description)
+            self._pending = None
+            self._index = index
+
+    def _rebuild_in_background(self):
+        try:
+            self.build()
+        except Exception:
+            # Старый индекс остается, следующий поиск после max_age попробует снова
+            with self._lock:
+                self._pending = None
+                self._index.built_at = time.monotonic()
+            logger.exception("Не удалось перестроить поисковый индекс")
+        finally:
+            connection.close()
+
+    def _ensure_built(self):
+        with self._lock:
+            if self._index is None:
+                # Первый поиск в процессе ждет построения индекса: искать пока не по чему
+                self.build()
+            elif self._pending is None and time.monotonic() - self._index.built_at > self.max_age:
+                self._pending = []
+                threading.Thread(target=self._rebuild_in_background, daemon=True).start()
+            return self._index
+
+    def update(self, product):
+        with self._lock:
+            if self._index is None:
+                return
+            if self._pending is not None:
+                self._pending.append((product.pk, product))
+            self._index.remove(product.pk)
+            self._index.add(product.pk, product.name, product.description)
+
+    def remove(self, pk):
+        with self._lock:
+            if self._index is None:
+                return
+            if self._pending is not None:
+                self._pending.append((pk, None))
+            self._index.remove(pk)
+
+    def scores(self, query):
+        """Словарь pk -> score по всем подходящим товарам. Как и plainto_tsquery,
+        документ должен содержать все слова запроса."""
+        terms = set(tokenize(query))
+        if not terms:
+            return {}
+
+        index = self._ensure_built()
+        with self._lock:
+            postings = [index.postings.get(term, {}) for term in terms]
+            if not all(postings):
+                return {}
+
+            postings.sort(key=len)
+            candidates = postings[0].keys()
+            for term_postings in postings[1:]:
+                candidates = candidates & term_postings.keys()
+
+            documents_count = len(index.doc_lengths)
+            average_length = index.total_length / documents_count
+            k1, b, lengths = self.k1, self.b, index.doc_lengths
+            norms = {pk: k1 * (1 - b + b * lengths[pk] / average_length) for pk in candidates}
+
+            scores = dict.fromkeys(candidates, 0)
+            for term_postings in postings:
+                idf = math.log(1 + (documents_count - len(term_postings) + 0.5) / (len(term_postings) + 0.5))
+                weight = idf * (k1 + 1)
+                for pk in candidates:
+                    frequency = term_postings[pk]
+                    scores[pk] += weight * frequency / (frequency + norms[pk])
+
+        return scores
+
+    def rank(self, query):
+        """Список (pk, score) по убыванию релевантности"""
+        return sorted(self.scores(query).items(), key=lambda item: (-item[1], item[0]))
+
+    def search(self, query):
+        scores = self.scores(query)
+        if not scores:
+            return Products.objects.none()
+
+        # Все найденные товары, без ограничения количества - как в PostgresSearchBackend.
+        # Оценки передаются одним jsonb-параметром: поиск ключа в jsonb логарифмический,
+        # а не линейный, как в CASE с WHEN на каждый товар
+        rank = RawSQL(f'(%s::jsonb ->> "{Products._meta.db_table}"."id"::text)::float8',
+                      (json.dumps(scores),), output_field=FloatField())
+        return (Products.objects.filter(pk__in=list(scores))
+                .annotate(rank=rank)
+                .order_by("-rank", "id"))
+
+
+_backend = None
+
+
+def get_search_backend():
+    global _backend
+    if _backend is None:
+        _backend = import_string(settings.GOODS_SEARCH_BACKEND)()
+    return _backend
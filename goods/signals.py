@@ -0,0 +1,58 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from goods.cache import invalidate_categories, invalidate_product, invalidate_products
+from goods.models import Categories, Products
+from goods.search import get_search_backend
+
+
+@receiver(pre_save, sender=Products)
+def remember_previous_state(sender, instance, **kwargs):
+    # Категория и slug до сохранения: при переносе товара нужно сбросить кэш обеих категорий,
+    # при смене slug - кэш товара по старому slug
+    instance._previous_category_id, instance._previous_slug = (
+        Products.objects.filter(pk=instance.pk).values_list("category_id", "slug").first()
+        if instance.pk else None
+    ) or (None, None)
+
+
+# Кэш сбрасывается после фиксации транзакции (товары меняются и при оформлении заказа, внутри нее):
+# иначе параллельный запрос успел бы закэшировать еще не измененную строку уже под новой версией
+@receiver(post_save, sender=Products)
+def invalidate_category_cache(sender, instance, **kwargs):
+    category_ids = (instance.category_id, getattr(instance, "_previous_category_id", None))
+    product = (instance.pk, instance.slug, getattr(instance, "_previous_slug", None))
+
+    def invalidate():
+        invalidate_products(*category_ids)
+        invalidate_product(*product)
+
+    transaction.on_commit(invalidate)
+
+
+@receiver(post_delete, sender=Products)
+def invalidate_deleted_category_cache(sender, instance, **kwargs):
+    category_id, pk, slug = instance.category_id, instance.pk, instance.slug
+
+    def invalidate():
+        invalidate_products(category_id)
+        invalidate_product(pk, slug)
+
+    transaction.on_commit(invalidate)
+
+
+@receiver(post_save, sender=Products)
+def update_search_index(sender, instance, **kwargs):
+    get_search_backend().update(instance)
+
+
+@receiver(post_delete, sender=Products)
+def remove_from_search_index(sender, instance, **kwargs):
+    get_search_backend().remove(instance.pk)
+
+
+@receiver(post_save, sender=Categories)
+@receiver(post_delete, sender=Categories)
+def invalidate_categories_cache(sender, **kwargs):
+    transaction.on_commit(invalidate_categories)
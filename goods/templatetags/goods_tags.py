@@ -1,14 +1,14 @@
 from django import template
 from django.utils.http import urlencode
 
-from goods.models import Categories
+from goods.cache import get_category_list
 
 register = template.Library()
 
 
 @register.simple_tag()
 def tag_categories():
-    return Categories.objects.all()
+    return get_category_list()
 
 
 @register.simple_tag(takes_context=True)
@@ -1,3 +1,34 @@
-from django.test import TestCase
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 
-# Create your tests here.
+from goods.cache import get_catalog_version, get_product, product_key
+from goods.models import Categories, Products
+
+TEST_CACHES = {alias: {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": f"test-{alias}"}
+               for alias in settings.CACHES}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ProductCacheInvalidationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Categories.objects.create(name="Шкафы", slug="shkafy")
+        cls.product = Products.objects.create(name="Шкаф", slug="shkaf", price=500, quantity=3, category=category)
+
+    def test_cache_dropped_only_after_commit(self):
+        get_product(pk=self.product.pk)
+        version = get_catalog_version()
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.product.quantity = 2
+            self.product.save()
+            # До фиксации другие запросы видят старую строку - кэш и версия пока не трогаются
+            self.assertEqual(get_catalog_version(), version)
+            self.assertIsNotNone(cache.get(product_key("pk", self.product.pk)))
+
+        for callback in callbacks:
+            callback()
+
+        self.assertNotEqual(get_catalog_version(), version)
+        self.assertEqual(get_product(pk=self.product.pk).quantity, 2)
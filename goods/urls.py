@@ -1,10 +1,17 @@
+from django.conf import settings
 from django.urls import path
 from goods import views
 
 app_name = "goods"
 
+# Под ASGI (eshop/asgi.py) каталог и страницу товара обслуживают async-представления
+if settings.ASYNC_VIEWS:
+    catalog_view, product_view = views.AsyncCatalogView, views.AsyncProductView
+else:
+    catalog_view, product_view = views.CatalogView, views.ProductView
+
 urlpatterns = [
-    path("search/", views.CatalogView.as_view(), name='search'),
-    path("<slug:category_slug>/", views.CatalogView.as_view(), name='index'),
-    path("product/<slug:product_slug>/", views.ProductView.as_view(), name='product'),
+    path("search/", catalog_view.as_view(), name='search'),
+    path("<slug:category_slug>/", catalog_view.as_view(), name='index'),
+    path("product/<slug:product_slug>/", product_view.as_view(), name='product'),
 ]
\ No newline at end of file
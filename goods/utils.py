@@ -1,16 +1,117 @@
-from django.contrib.postgres.search import SearchVector, SearchQuery, SearchRank, SearchHeadline
-from django.db.models import Q
+from hashlib import md5
+
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger
+from django.db import OperationalError, connection, transaction
+from django.db.models import Case, Count, Q, When
+from django.utils.http import quote_etag
 
 from goods.models import Products
+from goods.search import get_search_backend
+
+# Количество товаров на странице каталога (API и серверный рендеринг первой страницы)
+CATALOG_PAGE_SIZE = 3
+SUGGEST_MIN_LENGTH = 2
+SUGGEST_LIMIT = 5
+SUGGEST_MAX_LIMIT = 10
+# Бюджет на один запрос подсказок: они вызываются на каждое нажатие клавиши
+SUGGEST_TIMEOUT_MS = 150
+# Границы интервалов гистограммы цен в фасетах, последний интервал открыт сверху
+PRICE_FACET_BUCKETS = (0, 50, 100, 250, 500, 1000)
+
+
+def normalize_query(query):
+    return " ".join(query.lower().split())
+
+
+def product_etag(product, *extra):
+    """ETag товара меняется при каждом сохранении. В extra - все остальное,
+    от чего зависит ответ: формат, пользователь, корзина"""
+    value = ":".join(str(part) for part in (product.pk, product.updated_timestamp.timestamp(), *extra))
+    return quote_etag(md5(value.encode()).hexdigest())
+
+
+async def acount_pages(paginator):
+    """Paginator.count через async ORM - после этого num_pages и validate_number() не обращаются к БД"""
+    paginator.count = await paginator.object_list.acount()
+
+
+async def apage(paginator, number, strict=True):
+    """Paginator.page() через async ORM: строки страницы выбираются сразу, до рендеринга.
+    Количество уже посчитано acount_pages(). strict=False - как Paginator.get_page():
+    некорректный номер заменяется первой или последней страницей"""
+    try:
+        number = paginator.validate_number(number)
+    except PageNotAnInteger:
+        if strict:
+            raise
+        number = 1
+    except EmptyPage:
+        if strict:
+            raise
+        number = paginator.num_pages
+
+    bottom = (number - 1) * paginator.per_page
+    top = bottom + paginator.per_page
+    if top + paginator.orphans >= paginator.count:
+        top = paginator.count
+    return Page([obj async for obj in paginator.object_list[bottom:top]], number, paginator)
 
 
 def q_search(query):
     if query.isdigit() and len(query) <= 5:
         return Products.objects.filter(pk=int(query))
 
-    vector = SearchVector("name", "description")
-    query = SearchQuery(query)
+    return get_search_backend().search(query)
+
+
+def q_suggest(prefix, limit=SUGGEST_LIMIT):
+    """Подсказки по названию товара: сначала совпадения по началу, затем нечеткие (pg_trgm).
+    Возвращает None, если запрос не уложился в SUGGEST_TIMEOUT_MS."""
+    from django.contrib.postgres.search import TrigramWordSimilarity
+
+    suggestions = (Products.objects
+                   .filter(name__trigram_word_similar=prefix)
+                   .annotate(is_prefix=Case(When(name__istartswith=prefix, then=1), default=0),
+                             similarity=TrigramWordSimilarity(prefix, "name"))
+                   .order_by("-is_prefix", "-similarity", "id")
+                   .only("pk", "name", "slug", "sell_price")[:limit])
+
+    try:
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL statement_timeout = %s", [SUGGEST_TIMEOUT_MS])
+            return list(suggestions)
+    except OperationalError:
+        return None
+
+
+def product_facets(goods, category_slug=None):
+    """Фасеты каталога одним SQL-запросом с GROUP BY по категории.
+    Количество по категориям считается без учета выбранной категории, остальные фасеты - по ней."""
+    edges = PRICE_FACET_BUCKETS + (None,)
+    buckets = {
+        f"price_{i}": Count("id", filter=Q(sell_price__gte=low) & (Q(sell_price__lt=high) if high is not None else Q()))
+        for i, (low, high) in enumerate(zip(edges, edges[1:]))
+    }
+    rows = (goods.order_by()
+            .values("category__slug", "category__name")
+            .annotate(total=Count("id"),
+                      on_sale=Count("id", filter=Q(discount__gt=0)),
+                      in_stock=Count("id", filter=Q(quantity__gt=0)),
+                      **buckets)
+            .order_by("category__id"))
 
-    result = Products.objects.annotate(rank=SearchRank(vector, query)).filter(rank__gt=0).order_by("-rank")
+    selected = [row for row in rows if category_slug in (None, "all", row["category__slug"])]
 
-    return result
+    return {
+        "total": sum(row["total"] for row in selected),
+        "on_sale": sum(row["on_sale"] for row in selected),
+        "in_stock": sum(row["in_stock"] for row in selected),
+        "categories": [
+            {"slug": row["category__slug"], "name": row["category__name"], "count": row["total"]} for row in rows
+        ],
+        "price": [
+            {"min": low, "max": high, "count": sum(row[f"price_{i}"] for row in selected)}
+            for i, (low, high) in enumerate(zip(edges, edges[1:]))
+        ],
+    }
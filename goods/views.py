@@ -1,24 +1,80 @@
+from asgiref.sync import sync_to_async
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.core.paginator import Paginator
 from django.http import Http404
+from django.utils.cache import get_conditional_response
+from django.utils.http import urlencode
 from django.views.generic import DetailView, TemplateView
-from goods.models import Categories, Products
-from goods.utils import q_search
 
+from carts.storage import get_cart_store
+from goods.cache import aget_product, get_product, get_products_version
+from goods.mixins import AsyncProductsFilterMixin, ProductsFilterMixin
+from goods.models import Products
+from goods.utils import CATALOG_PAGE_SIZE, acount_pages, apage, product_etag
 
-class CatalogView(TemplateView):
+
+class CatalogView(ProductsFilterMixin, TemplateView):
     template_name = "goods/catalog.html"
+    # Время жизни закэшированного фрагмента со списком товаров
+    products_cache_timeout = 60 * 10
+    products_cache_params = ("q", "on_sale", "min_price", "max_price", "order_by", "page")
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['title'] = "ModaHouse - Каталог"
         slug_url = self.kwargs.get("category_slug")
+        category = None
         if slug_url:
             if slug_url != "all":
-                category = Categories.objects.get(slug=self.kwargs["category_slug"])
+                category = self.get_category(slug_url)
+                if category is None:
+                    raise Http404()
                 context['category'] = category.name
             else:
                 context['category'] = "Все товары"
+
+        # Первая страница рендерится на сервере (кроме курсорной пагинации - ее загружает JS)
+        context['render_products'] = self.request.GET.get("pagination") != "cursor"
+        context['products_page'] = self.get_products_page
+        context['products_cache_timeout'] = self.products_cache_timeout
+        context['products_cache_key'] = urlencode([
+            ("category", slug_url or ""),
+            ("version", get_products_version(category.pk if category and not self.request.GET.get("q") else None)),
+            *((name, self.request.GET.get(name, "")) for name in self.products_cache_params),
+        ])
         return context
 
+    def get_category_slug(self):
+        return self.kwargs.get("category_slug")
+
+    def get_products(self):
+        try:
+            return self.order_products(self.filter_by_category(self.search_products()))
+        except Http404:
+            return Products.objects.none()
+
+    def get_products_page(self):
+        # Вызывается из шаблона только при промахе кэша фрагмента
+        return Paginator(self.get_products(), CATALOG_PAGE_SIZE).get_page(self.request.GET.get("page"))
+
+
+class AsyncCatalogView(AsyncProductsFilterMixin, CatalogView):
+    """CatalogView для ASGI: категории и страница товаров выбираются через async ORM"""
+
+    async def get(self, request, *args, **kwargs):
+        await self.aload_categories()
+        context = self.get_context_data(**kwargs)
+
+        # Страница товаров нужна шаблону только при промахе кэша фрагмента - тогда выбираем ее заранее
+        fragment_key = make_template_fragment_key("catalog_products", [context['products_cache_key']])
+        if context['render_products'] and fragment_key not in cache:
+            paginator = Paginator(await self.abuild_queryset(self.get_products), CATALOG_PAGE_SIZE)
+            await acount_pages(paginator)
+            context['products_page'] = await apage(paginator, request.GET.get("page"), strict=False)
+        return self.render_to_response(context)
+
 
 class ProductView(DetailView):
     template_name = "goods/product.html"
@@ -26,10 +82,37 @@ class ProductView(DetailView):
     context_object_name = "product"
 
     def get_object(self, queryset=None):
-        product = Products.objects.get(slug=self.kwargs[self.slug_url_kwarg])
+        product = get_product(slug=self.kwargs[self.slug_url_kwarg])
+        if product is None:
+            raise Http404()
         return product
 
+    def get(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        return self.conditional_response(request)
+
+    def conditional_response(self, request):
+        # Кроме товара страница зависит от шапки (пользователь, корзина) и от непоказанных уведомлений
+        carts = get_cart_store(request).quantities()
+        etag = product_etag(self.object, request.user.pk, len(get_messages(request)), *carts)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = self.render_to_response(self.get_context_data(object=self.object))
+        response.headers["ETag"] = etag
+        return response
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['title'] = self.object.name
         return context
+
+
+class AsyncProductView(ProductView):
+    """ProductView для ASGI: товар выбирается через async ORM. Шапка страницы (пользователь, корзина, уведомления)
+    читается из сессии синхронно, поэтому ETag и ответ строятся в потоке"""
+
+    async def get(self, request, *args, **kwargs):
+        self.object = await aget_product(slug=self.kwargs[self.slug_url_kwarg])
+        if self.object is None:
+            raise Http404()
+        return await sync_to_async(self.conditional_response)(request)
@@ -53,6 +53,8 @@ class OrderAdmin(admin.ModelAdmin):
         "payment_on_get",
         "is_paid",
         "created_timestamp",
+        "total_quantity",
+        "total_amount",
     )
 
     search_fields = (
@@ -65,4 +67,15 @@ class OrderAdmin(admin.ModelAdmin):
         "payment_on_get",
         "is_paid",
     )
-    inlines = (OrderItemTabulareAdmin,)
\ No newline at end of file
+    inlines = (OrderItemTabulareAdmin,)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_totals()
+
+    @admin.display(description="Количество товаров", ordering="total_quantity")
+    def total_quantity(self, obj):
+        return obj.total_quantity
+
+    @admin.display(description="Сумма заказа", ordering="total_amount")
+    def total_amount(self, obj):
+        return obj.total_amount
\ No newline at end of file
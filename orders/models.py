@@ -1,18 +1,36 @@
 from django.db import models
+from django.db.models import F, Sum, Value
+from django.db.models.functions import Coalesce, Round
 from goods.models import Products
 
 from users.models import User
 
 
+def items_total_price(prefix=""):
+    """SQL-выражение суммы заказа: то же, что сумма OrderItem.products_price()"""
+    return Coalesce(Sum(Round(F(f"{prefix}price") * F(f"{prefix}quantity"), 2)), Value(0),
+                    output_field=models.DecimalField(max_digits=12, decimal_places=2))
+
+
+def items_total_quantity(prefix=""):
+    return Coalesce(Sum(f"{prefix}quantity"), Value(0))
+
+
 class OrderitemQueryset(models.QuerySet):
 
     def total_price(self):
-        return sum(cart.products_price() for cart in self)
+        return self.aggregate(total_price=items_total_price())["total_price"]
 
     def total_quantity(self):
-        if self:
-            return sum(cart.quantity for cart in self)
-        return 0
+        return self.aggregate(total_quantity=items_total_quantity())["total_quantity"]
+
+
+class OrderQueryset(models.QuerySet):
+
+    def with_totals(self):
+        """Сумма и количество товаров каждого заказа в том же запросе (JOIN + GROUP BY)"""
+        return self.annotate(total_amount=items_total_price("orderitem__"),
+                             total_quantity=items_total_quantity("orderitem__"))
 
 
 class Order(models.Model):
@@ -32,6 +50,8 @@ class Order(models.Model):
         verbose_name_plural = "Заказы"
         ordering = ("id",)
 
+    objects = OrderQueryset.as_manager()
+
     def __str__(self):
         return f"Заказ № {self.pk} | Покупатель {self.user.first_name} {self.user.last_name}"
 
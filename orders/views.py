@@ -6,7 +6,7 @@ from django.shortcuts import redirect
 from django.urls import reverse_lazy
 from django.views.generic import FormView
 
-from carts.models import Cart
+from carts.storage import DatabaseCartStore
 from orders.forms import CreateOrderForm
 from orders.models import Order, OrderItem
 
@@ -26,9 +26,11 @@ class CreateOrderView(LoginRequiredMixin, FormView):
         try:
             with transaction.atomic():
                 user = self.request.user
-                cart_items = Cart.objects.filter(user=user)
+                # Строки корзины с товарами выбираются один раз
+                cart_store = DatabaseCartStore(user)
+                cart_items = list(cart_store.items())
 
-                if cart_items.exists():
+                if cart_items:
                     # Формируем заказ
                     order = Order.objects.create(
                         user=user,
@@ -41,7 +43,7 @@ class CreateOrderView(LoginRequiredMixin, FormView):
                     for cart_item in cart_items:
                         product = cart_item.product
                         name = cart_item.product.name
-                        price = cart_item.product.sell_price()
+                        price = cart_item.product.sell_price
                         quantity = cart_item.quantity
 
                         if product.quantity < quantity:
@@ -59,7 +61,7 @@ class CreateOrderView(LoginRequiredMixin, FormView):
                         product.save()
 
                     # Очищение корзины
-                    cart_items.delete()
+                    cart_store.clear()
 
                     messages.success(self.request, 'Заказ оформлен!')
                     return redirect('user:profile')
@@ -56,10 +56,6 @@ $(document).ready(function () {
          // Блокируем его базовое действие
          e.preventDefault();
 
-         // Берем элемент счетчика в значке корзины и берем оттуда значение
-         var goodsInCartCount = $("#goods-in-cart-count");
-         var cartCount = parseInt(goodsInCartCount.text() || 0);
-
          // Получаем id корзины из атрибута data-cart-id
          var cart_id = $(this).data("cart-id");
          // Из атрибута href берем ссылку на контроллер django
@@ -72,6 +68,8 @@ $(document).ready(function () {
              url: remove_from_cart,
              data: {
                  cart_id: cart_id,
+                 // Версия корзины на странице: в ответ придут только изменения
+                 version: cartVersion(),
                  csrfmiddlewaretoken: $("[name=csrfmiddlewaretoken]").val(),
              },
              success: function (data) {
@@ -83,13 +81,8 @@ $(document).ready(function () {
                      successMessage.fadeOut(400);
                  }, 7000);
 
-                 // Уменьшаем количество товаров в корзине (отрисовка)
-                 cartCount -= data.quantity_deleted;
-                 goodsInCartCount.text(cartCount);
-
-                 // Меняем содержимое корзины на ответ от django (новый отрисованный фрагмент разметки корзины)
-                 var cartItemsContainer = $("#cart-items-container");
-                 cartItemsContainer.html(data.cart_items_html);
+                 // Убираем строку и обновляем итоги (или всю корзину, если ее меняли в другой вкладке)
+                 applyCartDelta(data, cart_id);
 
              },
 
@@ -117,8 +110,8 @@ $(document).ready(function () {
          if (currentValue > 1) {
              $input.val(currentValue - 1);
              // Запускаем функцию определенную ниже
-             // с аргументами (id карты, новое количество, количество уменьшилось или прибавилось, url)
-             updateCart(cartID, currentValue - 1, -1, url);
+             // с аргументами (id карты, новое количество, url)
+             updateCart(cartID, currentValue - 1, url);
          }
      });
 
@@ -136,17 +129,18 @@ $(document).ready(function () {
          $input.val(currentValue + 1);
 
          // Запускаем функцию определенную ниже
-         // с аргументами (id карты, новое количество, количество уменьшилось или прибавилось, url)
-         updateCart(cartID, currentValue + 1, 1, url);
+         // с аргументами (id карты, новое количество, url)
+         updateCart(cartID, currentValue + 1, url);
      });
 
-     function updateCart(cartID, quantity, change, url) {
+     function updateCart(cartID, quantity, url) {
          $.ajax({
              type: "POST",
              url: url,
              data: {
                  cart_id: cartID,
                  quantity: quantity,
+                 version: cartVersion(),
                  csrfmiddlewaretoken: $("[name=csrfmiddlewaretoken]").val(),
              },
 
@@ -159,15 +153,8 @@ $(document).ready(function () {
                       successMessage.fadeOut(400);
                  }, 7000);
 
-                 // Изменяем количество товаров в корзине
-                 var goodsInCartCount = $("#goods-in-cart-count");
-                 var cartCount = parseInt(goodsInCartCount.text() || 0);
-                 cartCount += change;
-                 goodsInCartCount.text(cartCount);
-
-                 // Меняем содержимое корзины
-                 var cartItemsContainer = $("#cart-items-container");
-                 cartItemsContainer.html(data.cart_items_html);
+                 // Обновляем строку и итоги (или всю корзину, если ее меняли в другой вкладке)
+                 applyCartDelta(data);
 
              },
              error: function (data) {
@@ -176,6 +163,59 @@ $(document).ready(function () {
          });
      }
 
+     // Версия корзины, по которой отрисована страница. Берем через attr, а не data:
+     // число не помещается в Number без потери точности
+     function cartVersion() {
+         return $("#cart-lines").attr("data-cart-version");
+     }
+
+     // Применяем ответ django на изменение корзины
+     function applyCartDelta(data, removedCartID) {
+         if (data.cart_items_html !== undefined) {
+             // Корзина на странице устарела - django прислал новый отрисованный фрагмент разметки корзины
+             $("#cart-items-container").html(data.cart_items_html);
+         } else {
+             if (removedCartID !== undefined) {
+                 $(".cart-line[data-cart-id='" + removedCartID + "']").remove();
+             }
+             if (data.line) {
+                 var $line = $(".cart-line[data-cart-id='" + data.line.cart_id + "']");
+                 $line.find(".number").val(data.line.quantity);
+                 $line.find(".cart-line-price").text(data.line.price);
+             }
+             $("#cart-total-quantity").text(data.total_quantity);
+             $("#cart-total-price").text(data.total_price);
+             $("#cart-lines").attr("data-cart-version", data.version);
+             if (!data.total_quantity) {
+                 $("#cart-create-order").remove();
+             }
+         }
+         // Количество товаров в значке корзины
+         $("#goods-in-cart-count").text(data.total_quantity);
+     }
+
+    // Подсказки в строке поиска
+    var suggestTimer = null;
+    $("#search-input").on("input", function () {
+        var $input = $(this);
+        var query = $.trim($input.val());
+        clearTimeout(suggestTimer);
+        if (query.length < 2) {
+            return;
+        }
+        // Ждем паузу в наборе, чтобы не отправлять запрос на каждую букву
+        suggestTimer = setTimeout(function () {
+            $.getJSON($input.data("suggest-url"), {q: query}, function (data) {
+                var $list = $("#search-suggestions");
+                $list.empty();
+                $.each(data, function (i, product) {
+                    $list.append($("<option>").val(product.name));
+                });
+            });
+        }, 150);
+    });
+
+
     // Берем из разметки элемент по id - оповещения от django
     var notification = $('#notification');
     // И через 7 сек. убираем
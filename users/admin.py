@@ -1,6 +1,7 @@
 from django.contrib import admin
 
 from carts.admin import CartTabAdmin
+from carts.storage import DatabaseCartStore
 from orders.admin import OrderTabulareAdmin
 from users.models import User
 
@@ -10,3 +11,8 @@ class UserAdmin(admin.ModelAdmin):
     list_display = ["username", "first_name", "last_name", "email"]
     search_fields = ["username", "first_name", "last_name", "email"]
     inlines = [CartTabAdmin, OrderTabulareAdmin]
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Строки корзины в инлайне меняются в обход хранилища корзины
+        DatabaseCartStore(form.instance).mark_changed()
@@ -9,7 +9,7 @@ from django.shortcuts import render, redirect
 from django.urls import reverse, reverse_lazy
 from django.views.generic import CreateView, UpdateView, TemplateView
 
-from carts.models import Cart
+from carts.storage import merge_session_cart
 from orders.models import Order, OrderItem
 from users.forms import UserLoginForm, UserRegisterForm, ProfileForm
 
@@ -30,21 +30,13 @@ class UserLoginView(LoginView):
         return reverse_lazy("main:index")
 
     def form_valid(self, form):
-        session_key = self.request.session.session_key
         user = form.get_user()
 
         if user:
+            # Добавляем корзину из анонимной сессии к корзине пользователя
+            merge_session_cart(self.request, user)
             auth.login(self.request, user)
             messages.success(self.request, f"{user.username}, Вы вошли в аккаунт")
-            if session_key:
-                # Очищаем старую корзину пользователя
-                forgot_carts = Cart.objects.filter(user=user)
-
-                if forgot_carts.exists():
-                    forgot_carts.delete()
-
-                # Добавляем корзину из анонимной сессии
-                Cart.objects.filter(session_key=session_key).update(user=user)
 
             return HttpResponseRedirect(self.get_success_url())
 
@@ -60,15 +52,12 @@ class UserRegisterView(CreateView):
         return context
 
     def form_valid(self, form):
-        session_key = self.request.session.session_key
         user = form.instance
         if user:
             form.save()
+            merge_session_cart(self.request, user)
             auth.login(self.request, user)
 
-            if session_key:
-                Cart.objects.filter(session_key=session_key).update(user=user)
-
             messages.success(self.request, f"{user.username}, Вы успешно зарегистрированы и вошли в аккаунт")
             return HttpResponseRedirect(self.success_url)
 
@@ -82,7 +71,7 @@ class UserProfileView(LoginRequiredMixin, UpdateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['title'] = 'ModaHouse - Профиль'
-        context['orders'] = (Order.objects.filter(user=self.request.user).prefetch_related(
+        context['orders'] = (Order.objects.filter(user=self.request.user).with_totals().prefetch_related(
             Prefetch(
                 "orderitem_set",
                 queryset=OrderItem.objects.select_related("product")